@@ -0,0 +1,16 @@
+import pytest
+
+from core.test_runner import isolated_caches
+
+
+@pytest.fixture(autouse=True)
+def background_tasks_sync(settings):
+    """Фоновые задачи в тестах выполняются сразу, в потоке теста."""
+    settings.BACKGROUND_TASKS_ASYNC = False
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_caches(django_test_environment):
+    """Свой L2 кеша, как у ``manage.py test``."""
+    with isolated_caches():
+        yield
@@ -0,0 +1,142 @@
+import json
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import RequestProfile, SlowQuery
+
+
+def _pre(text):
+    return format_html('<pre style="white-space: pre-wrap">{}</pre>', text)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created",
+        "method",
+        "path",
+        "view_name",
+        "username",
+        "status",
+        "duration_ms",
+        "sql_count",
+    )
+    list_filter = ("view_name", "status")
+    search_fields = ("path", "username")
+    date_hierarchy = "created"
+    fields = (
+        "created",
+        "method",
+        "path",
+        "view_name",
+        "username",
+        "status",
+        "duration_ms",
+        "sql_count",
+        "sql_ms",
+        "download",
+        "queries_table",
+        "templates_table",
+        "report_text",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="core_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """Файл .prof для snakeviz или pstats."""
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        path = os.path.join(settings.PROFILER_DIR, profile.stats_file)
+        if not os.path.exists(path):
+            raise Http404
+        return FileResponse(
+            open(path, "rb"), as_attachment=True,
+            filename=profile.stats_file)
+
+    def download(self, obj):
+        url = reverse("admin:core_requestprofile_download", args=(obj.pk,))
+        return format_html('<a href="{}">{}</a>', url, obj.stats_file)
+    download.short_description = "Файл профиля"
+
+    def queries_table(self, obj):
+        queries = json.loads(obj.queries)
+        return format_html_join(
+            "\n", "<p><b>{} мс</b> {}<br><code>{}</code> {}</p>",
+            (
+                ("%.1f" % (query["time"] * 1000), query["site"],
+                 query["sql"], query["params"])
+                for query in sorted(queries, key=lambda q: -q["time"])
+            ),
+        )
+    queries_table.short_description = "SQL-запросы, самые долгие первыми"
+
+    def templates_table(self, obj):
+        return format_html_join(
+            "\n", "<p><b>{} мс</b> {}</p>",
+            (
+                ("%.1f" % (template["time"] * 1000), template["name"])
+                for template in json.loads(obj.templates)
+            ),
+        )
+    templates_table.short_description = "Шаблоны"
+
+    def report_text(self, obj):
+        return _pre(obj.report)
+    report_text.short_description = "Отчёт cProfile"
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("created", "duration_ms", "site", "short_sql")
+    list_filter = ("created",)
+    search_fields = ("sql", "site", "=fingerprint")
+    date_hierarchy = "created"
+    fields = (
+        "created",
+        "duration_ms",
+        "site",
+        "fingerprint",
+        "sql_text",
+        "params",
+        "plan_text",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def short_sql(self, obj):
+        return obj.sql[:150]
+    short_sql.short_description = "SQL"
+
+    def sql_text(self, obj):
+        return _pre(obj.sql)
+    sql_text.short_description = "SQL"
+
+    def plan_text(self, obj):
+        return _pre(obj.plan)
+    plan_text.short_description = "План (EXPLAIN)"
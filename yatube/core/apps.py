@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+
+        from . import holes, query_cache, signals, slow_queries  # noqa: F401
+
+        connection_created.connect(slow_queries.install)
+        connection_created.connect(query_cache.install)
+        request_finished.connect(slow_queries.flush_all)
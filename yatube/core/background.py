@@ -0,0 +1,55 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='yatube-background',
+        )
+    return _executor
+
+
+def _call(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        connection.close()
+
+
+def run(func, *args, **kwargs):
+    """Выполнить ``func`` вне запроса после коммита текущей транзакции.
+
+    При ``BACKGROUND_TASKS_ASYNC = False`` (только для тестов) функция
+    вызывается сразу, в текущем потоке. Ошибка задачи в обоих режимах
+    только пишется в лог и не ломает запрос.
+    """
+    if not settings.BACKGROUND_TASKS_ASYNC:
+        try:
+            with transaction.atomic():
+                func(*args, **kwargs)
+        except Exception:
+            logger.exception('Фоновая задача %s упала', func.__name__)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_call, func, args, kwargs))
+
+
+def schedule(func, *args, **kwargs):
+    """``run`` для кода, который нельзя задерживать (рендеринг шаблонов):
+    задача только ставится в очередь и в текущем потоке не выполняется
+    никогда. В синхронном режиме она пропускается.
+    """
+    if settings.BACKGROUND_TASKS_ASYNC:
+        run(func, *args, **kwargs)
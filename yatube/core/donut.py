@@ -0,0 +1,51 @@
+import base64
+import json
+import re
+
+# Имя дырки -> функция (request, **kwargs), которая отдаёт её HTML.
+HOLES = {}
+MARKER = '<!--donut:%s-->'
+MARKER_RE = re.compile(r'<!--donut:([A-Za-z0-9_=-]+)-->')
+
+
+def hole(name):
+    """Зарегистрировать дырку: часть страницы, зависящую от зрителя.
+
+    Функция получает текущий запрос и аргументы из шаблона; аргументы
+    хранятся в закешированной оболочке, поэтому должны сериализоваться
+    в JSON (id, строки, флаги).
+    """
+    def decorator(func):
+        HOLES[name] = func
+        return func
+    return decorator
+
+
+def placeholder(name, kwargs):
+    """Метка дырки в оболочке страницы.
+
+    Пользовательский текст экранируется шаблонами, поэтому подделать
+    метку из содержимого поста нельзя.
+    """
+    payload = json.dumps([name, kwargs], sort_keys=True)
+    return MARKER % base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def render_hole(request, name, kwargs):
+    return HOLES[name](request, **kwargs)
+
+
+def fill(request, content):
+    """Заменить метки в оболочке на дырки, отрисованные для ``request``."""
+    def replace(match):
+        name, kwargs = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        return render_hole(request, name, kwargs)
+    return MARKER_RE.sub(replace, content)
+
+
+def fill_response(request, response):
+    if response.streaming or 'text/html' not in response.get(
+            'Content-Type', ''):
+        return response
+    response.content = fill(request, response.content.decode(response.charset))
+    return response
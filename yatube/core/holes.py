@@ -0,0 +1,9 @@
+from django.template.loader import render_to_string
+
+from .donut import hole
+
+
+@hole('header')
+def header(request):
+    """Шапка: меню гостя или пользователя и активный пункт."""
+    return render_to_string('includes/header.html', request=request)
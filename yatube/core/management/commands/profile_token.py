@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Выписывает сотруднику токен профилирования для заголовка '
+        'X-Profile или параметра ?_profile='
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        username = options['username']
+        if not get_user_model().objects.filter(
+                username=username, is_staff=True).exists():
+            raise CommandError(f'{username} не сотрудник')
+        self.stdout.write(make_token(username))
@@ -0,0 +1,218 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Имя -> (тип, описание, границы корзин гистограммы).
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Запросы по view и коду ответа', None),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса', DURATION_BUCKETS),
+    'yatube_request_queries': (
+        'histogram', 'SQL-запросов на один запрос (выборка Server-Timing)',
+        QUERY_BUCKETS),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения из кеша: hit или miss (выборка Server-Timing)',
+        None),
+    'yatube_cache_tier_total': (
+        'counter', 'Чтения двухуровневого кеша: l1, l2 или miss', None),
+    'yatube_query_cache_total': (
+        'counter', 'Чтения кеша запросов ORM: hit или miss', None),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Время построения миниатюр одного поста',
+        DURATION_BUCKETS),
+}
+UNRESOLVED = '<unresolved>'
+
+
+class Registry:
+    """Счётчики и гистограммы одного процесса.
+
+    Гистограмма хранится как счётчики по корзинам (без накопления),
+    сумма и число наблюдений; при выводе корзины складываются.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.flushed = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = json.dumps([name, sorted(labels.items())])
+        with self.lock:
+            self.values[key] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        bucket = next(
+            (bound for bound in buckets if value <= bound), '+Inf')
+        self.inc(name + '_bucket', {**labels, 'le': str(bucket)})
+        self.inc(name + '_sum', labels, value)
+        self.inc(name + '_count', labels)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def flush(self, force=False):
+        """Записать снимок процесса в METRICS_DIR/<pid>.json.
+
+        Не чаще раза в METRICS_FLUSH_INTERVAL секунд, чтобы запросы не
+        платили за запись файла. Файл заменяется атомарно.
+        """
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+                not force
+                and now - self.flushed < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed = now
+        path = os.path.join(directory, '%d.json' % os.getpid())
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+def collect():
+    """Сложить снимки всех рабочих процессов.
+
+    Файлы завершившихся процессов остаются: их счётчики продолжают
+    входить в сумму, как в режиме multiprocess у prometheus_client.
+    Каталог очищается при запуске сервера, а не здесь.
+    """
+    if not settings.METRICS_DIR:
+        return registry.snapshot()
+    registry.flush(force=True)
+    values = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            logger.warning('Не прочитан файл метрик %s', path)
+            continue
+        for key, value in snapshot.items():
+            values[key] += value
+    return values
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join(
+            '%s="%s"' % (label, _escape(text)) for label, text in labels)
+    return '%s %s' % (name, repr(float(value)) if value % 1 else int(value))
+
+
+def _cumulative(samples, buckets):
+    """Корзины гистограммы в виде, который ждёт Prometheus: le накоплено."""
+    series = defaultdict(dict)
+    for labels, value in samples:
+        labels = dict(labels)
+        bound = labels.pop('le')
+        series[tuple(sorted(labels.items()))][bound] = value
+    for labels, counts in sorted(series.items()):
+        total = 0
+        for bound in [str(bound) for bound in buckets] + ['+Inf']:
+            total += counts.get(bound, 0)
+            yield tuple(labels) + (('le', bound),), total
+
+
+def render(values):
+    """Текстовый формат Prometheus (version 0.0.4)."""
+    samples = defaultdict(list)
+    for key, value in values.items():
+        name, labels = json.loads(key)
+        samples[name].append((tuple(map(tuple, labels)), value))
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, kind))
+        if kind == 'histogram':
+            for labels, value in _cumulative(
+                    samples[name + '_bucket'], buckets):
+                lines.append(_format(name + '_bucket', labels, value))
+            for suffix in ('_sum', '_count'):
+                for labels, value in sorted(samples[name + suffix]):
+                    lines.append(_format(name + suffix, labels, value))
+        else:
+            for labels, value in sorted(samples[name]):
+                lines.append(_format(name, labels, value))
+    cache = {
+        dict(labels)['result']: value
+        for labels, value in samples['yatube_cache_requests_total']
+    }
+    reads = cache.get('hit', 0) + cache.get('miss', 0)
+    lines.append('# HELP yatube_cache_hit_ratio Доля попаданий в кеш')
+    lines.append('# TYPE yatube_cache_hit_ratio gauge')
+    lines.append(_format(
+        'yatube_cache_hit_ratio', (),
+        cache.get('hit', 0) / reads if reads else 0))
+    return '\n'.join(lines) + '\n'
+
+
+def observe_request(request, response, elapsed, measured=None):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else UNRESOLVED
+    registry.inc('yatube_requests_total', {
+        'view': view, 'method': request.method,
+        'status': str(response.status_code)})
+    registry.observe('yatube_request_duration_seconds',
+                     {'view': view}, elapsed)
+    if measured is None:
+        return
+    registry.observe('yatube_request_queries',
+                     {'view': view}, measured.sql_count)
+    if measured.cache_hits:
+        registry.inc('yatube_cache_requests_total', {'result': 'hit'},
+                     measured.cache_hits)
+    if measured.cache_misses:
+        registry.inc('yatube_cache_requests_total', {'result': 'miss'},
+                     measured.cache_misses)
+
+
+class MetricsMiddleware:
+    """Метрики каждого запроса по имени view для /metrics.
+
+    Число запросов и время считаются для всех запросов: это два вызова
+    часов. Число SQL-запросов и чтения кеша берутся из замеров
+    ServerTimingMiddleware (ставится перед этим middleware) и есть только
+    у запросов из выборки SERVER_TIMING_SAMPLE_RATE: сами по себе метрики
+    запрос не замеряют.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        observe_request(request, response, time.perf_counter() - start,
+                        timing.current())
+        registry.flush()
+        return response
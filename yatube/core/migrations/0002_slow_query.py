@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Когда')),
+                ('duration_ms', models.FloatField(db_index=True, verbose_name='Время, мс')),
+                ('fingerprint', models.CharField(db_index=True, help_text='Одинаков у запросов, различающихся только параметрами', max_length=32, verbose_name='Отпечаток SQL')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.TextField(verbose_name='Параметры')),
+                ('site', models.CharField(max_length=500, verbose_name='Место вызова')),
+                ('plan', models.TextField(blank=True, verbose_name='План (EXPLAIN)')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
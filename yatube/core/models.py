@@ -0,0 +1,51 @@
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль одного запроса, снятый по подписанному заголовку.
+
+    Сам профиль cProfile лежит на диске в PROFILER_DIR, здесь — сводка
+    для админки: текстовый отчёт, SQL-запросы и шаблоны.
+    """
+    created = models.DateTimeField('Снят', auto_now_add=True, db_index=True)
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=2000)
+    view_name = models.CharField('View', max_length=200, blank=True)
+    username = models.CharField('Кто запросил', max_length=150)
+    status = models.PositiveSmallIntegerField('Код ответа')
+    duration_ms = models.FloatField('Время, мс')
+    sql_count = models.PositiveIntegerField('SQL-запросов')
+    sql_ms = models.FloatField('Время SQL, мс')
+    stats_file = models.CharField('Файл профиля', max_length=200)
+    report = models.TextField('Отчёт cProfile')
+    queries = models.TextField('SQL-запросы (JSON)')
+    templates = models.TextField('Шаблоны (JSON)')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return '%s %s' % (self.method, self.path)
+
+
+class SlowQuery(models.Model):
+    """SQL-запрос дольше SLOW_QUERY_THRESHOLD_MS с местом вызова и планом."""
+    created = models.DateTimeField('Когда', auto_now_add=True, db_index=True)
+    duration_ms = models.FloatField('Время, мс', db_index=True)
+    fingerprint = models.CharField(
+        'Отпечаток SQL', max_length=32, db_index=True,
+        help_text='Одинаков у запросов, различающихся только параметрами')
+    sql = models.TextField('SQL')
+    params = models.TextField('Параметры')
+    site = models.CharField('Место вызова', max_length=500)
+    plan = models.TextField('План (EXPLAIN)', blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return '%.0f мс %s' % (self.duration_ms, self.site)
@@ -0,0 +1,118 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from . import timing
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+SALT = 'core.profiling'
+
+
+def make_token(username):
+    """Подписанный токен, который включает профилирование запросов."""
+    return signing.dumps(username, salt=SALT)
+
+
+def token_user(token):
+    """Сотрудник, выписавший токен, или None для чужого и просроченного."""
+    try:
+        username = signing.loads(
+            token, salt=SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        logger.warning('Неверный или просроченный токен профилирования')
+        return None
+    user = get_user_model().objects.filter(
+        username=username, is_staff=True, is_active=True).first()
+    if user is None:
+        logger.warning('Токен профилирования не сотрудника: %s', username)
+    return user
+
+
+def _report(profiler):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative')
+    stats.print_stats(settings.PROFILER_REPORT_LINES)
+    stats.print_callees(settings.PROFILER_REPORT_LINES)
+    return stream.getvalue()
+
+
+def _public_path(request):
+    """Путь запроса без токена: профили видны в админке дольше, чем
+    живёт токен, и он не должен оставаться в базе."""
+    query = request.GET.copy()
+    query.pop(QUERY_PARAM, None)
+    if not query:
+        return request.path
+    return '%s?%s' % (request.path, query.urlencode())
+
+
+def save(request, response, user, profiler, measured, elapsed):
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    stats_file = '%s-%s.prof' % (
+        timezone.now().strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+    profiler.dump_stats(os.path.join(settings.PROFILER_DIR, stats_file))
+    match = getattr(request, 'resolver_match', None)
+    return RequestProfile.objects.create(
+        method=request.method,
+        path=_public_path(request)[:2000],
+        view_name=match.view_name if match else '',
+        username=user.username,
+        status=response.status_code,
+        duration_ms=elapsed * 1000,
+        sql_count=len(measured.queries),
+        sql_ms=sum(query['time'] for query in measured.queries) * 1000,
+        stats_file=stats_file,
+        report=_report(profiler),
+        queries=json.dumps(measured.queries, ensure_ascii=False),
+        templates=json.dumps(measured.templates, ensure_ascii=False),
+    )
+
+
+class ProfilerMiddleware:
+    """Профилировать запрос с подписанным токеном сотрудника.
+
+    Токен (``manage.py profile_token``) передаётся в заголовке
+    ``X-Profile`` или параметре ``?_profile=``. Остальные запросы
+    проходят без профилировщика, поэтому middleware можно держать
+    включённым в продакшене. Номер сохранённого профиля возвращается в
+    заголовке ``X-Profile-Id``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+        user = token_user(token) if token else None
+        if user is None:
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        with timing.measure(detail=True) as measured:
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+        profile = save(request, response, user, profiler, measured, elapsed)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
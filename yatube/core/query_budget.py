@@ -0,0 +1,141 @@
+import os
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+SITE_PACKAGES = os.sep + 'site-packages' + os.sep
+ORM_PATHS = (
+    os.sep + os.path.join('django', 'db') + os.sep,
+    os.sep + os.path.join('django', 'utils') + os.sep,
+)
+# Файлы с перехватчиками execute_wrappers: их кадры оказываются в стеке
+# любого запроса и местом вызова не считаются.
+WRAPPER_FILES = {__file__}
+
+
+def _format_frame(frame):
+    filename = frame.filename
+    if SITE_PACKAGES in filename:
+        filename = filename.split(SITE_PACKAGES, 1)[1]
+    else:
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    return '%s:%s in %s' % (filename, frame.lineno, frame.name)
+
+
+def call_site(stack=None, skip=()):
+    """Место вызова запроса: ``posts/views.py:48 in index``.
+
+    Берётся первый кадр из кода проекта; если запрос на самом деле
+    выполнила библиотека (админка, шаблоны), её кадр дописывается
+    после стрелки. Файлы из ``skip`` и ``WRAPPER_FILES``
+    (обёртки-перехватчики) пропускаются.
+    """
+    stack = stack or traceback.extract_stack()
+    base_dir = settings.BASE_DIR + os.sep
+    origin = None
+    for frame in reversed(stack[:-1]):
+        filename = frame.filename
+        if filename in WRAPPER_FILES or filename in skip:
+            continue
+        if origin is None and not any(
+                path in filename for path in ORM_PATHS):
+            origin = frame
+        if filename.startswith(base_dir) and SITE_PACKAGES not in filename:
+            site = _format_frame(frame)
+            if origin is not None and origin is not frame:
+                site += ' ← ' + _format_frame(origin)
+            return site
+    return '<вне проекта>'
+
+
+class QueryBudget(ContextDecorator):
+    """Ограничение на число SQL-запросов и их суммарное время.
+
+    Работает и как контекстный менеджер, и как декоратор::
+
+        with QueryBudget(5, max_time=0.05, label='index'):
+            client.get('/')
+
+    При превышении бросает ``QueryBudgetExceeded`` со списком запросов,
+    сгруппированных по месту вызова в коде проекта.
+    """
+
+    def __init__(self, max_queries, max_time=None, label='',
+                 using='default'):
+        self.max_queries = max_queries
+        self.max_time = max_time
+        self.label = label
+        self.using = using
+        self.queries = []
+
+    def __call__(self, func):
+        if not self.label:
+            self.label = func.__qualname__
+        return super().__call__(func)
+
+    def _record(self, execute, sql, params, many, context):
+        site = call_site()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'time': time.perf_counter() - start,
+                'site': site,
+            })
+
+    def __enter__(self):
+        self.queries = []
+        self._wrapper = connections[self.using].execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._wrapper.__exit__(exc_type, exc_value, tb)
+        if exc_type is None:
+            self.check()
+        return False
+
+    @property
+    def total_time(self):
+        return sum(query['time'] for query in self.queries)
+
+    def check(self):
+        over_count = len(self.queries) > self.max_queries
+        over_time = (self.max_time is not None
+                     and self.total_time > self.max_time)
+        if over_count or over_time:
+            raise QueryBudgetExceeded(self.report())
+
+    def grouped(self):
+        """Запросы по местам вызова, самые частые первыми."""
+        groups = OrderedDict()
+        for query in self.queries:
+            groups.setdefault(query['site'], []).append(query)
+        return sorted(groups.items(), key=lambda item: -len(item[1]))
+
+    def report(self):
+        budget_time = (
+            '' if self.max_time is None else ' (бюджет %.3fs)' % self.max_time)
+        lines = [
+            'Превышен бюджет запросов %s: %d запросов (бюджет %d), '
+            'SQL %.3fs%s' % (
+                self.label, len(self.queries), self.max_queries,
+                self.total_time, budget_time),
+        ]
+        for site, queries in self.grouped():
+            lines.append('  %d × %s (%.3fs)' % (
+                len(queries), site,
+                sum(query['time'] for query in queries)))
+            lines.append('      %s' % queries[0]['sql'][:300])
+        return '\n'.join(lines)
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models.query import NamedValuesListIterable
+
+from .metrics import registry
+from .query_budget import WRAPPER_FILES
+from .versions import bump, get_with_versions
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+WRAPPER_FILES.add(__file__)
+
+RESULT_KEY = 'query:%s'
+# Таблицы, которые читает запрос, и таблица, в которую пишет команда.
+READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+[`"\[]?(\w+)', re.I)
+WRITE_TABLE_RE = re.compile(
+    r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE'
+    r'|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|(?:CREATE|DROP)\s+TABLE'
+    r'(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+[`"\[]?(\w+)', re.I)
+
+
+def table_scope(table):
+    return 'table:%s' % table
+
+
+def read_tables(sql):
+    ignored = settings.QUERY_CACHE_IGNORED_TABLES
+    return sorted({table for table in READ_TABLES_RE.findall(sql)
+                   if table not in ignored})
+
+
+def invalidate(*tables):
+    """Устарить результаты всех запросов, читающих ``tables``."""
+    bump(*(table_scope(table) for table in tables))
+
+
+def install(sender, connection, **kwargs):
+    """Подключить отслеживание записей к соединению (сигнал
+    connection_created); в начало списка, как ``slow_queries.install``."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, track_writes)
+
+
+def track_writes(execute, sql, params, many, context):
+    """После записи в таблицу сменить её версию.
+
+    Так ловятся любые записи: ``save()``, ``QuerySet.update()`` и
+    ``delete()``, ``bulk_create`` и сырой SQL — сигналы моделей о
+    массовых операциях не сообщают. В транзакции версия меняется сразу
+    (чтобы другие процессы не сохранили в кеш то, что вот-вот изменится)
+    и ещё раз после фиксации.
+    """
+    result = execute(sql, params, many, context)
+    match = WRITE_TABLE_RE.match(sql)
+    if match is None or getattr(_local, 'busy', False) \
+            or not settings.QUERY_CACHE_ENABLED:
+        return result
+    table = match.group(1)
+    if table in settings.QUERY_CACHE_IGNORED_TABLES:
+        return result
+    connection = context['connection']
+    _local.busy = True
+    try:
+        invalidate(table)
+        if connection.in_atomic_block:
+            connection.query_cache_dirty = True
+            transaction.on_commit(
+                lambda: invalidate(table), using=connection.alias)
+    except Exception:
+        logger.exception('Версия таблицы %s не сменилась', table)
+    finally:
+        _local.busy = False
+    return result
+
+
+def _dirty(connection):
+    """Транзакция соединения уже что-то записала: прочитанное в ней
+    может откатиться и в кеш не сохраняется."""
+    if not connection.in_atomic_block:
+        connection.query_cache_dirty = False
+    return getattr(connection, 'query_cache_dirty', False)
+
+
+def fetch(queryset, kind, compute):
+    """Результат ``compute()`` для ``queryset`` из кеша или из базы.
+
+    Ключ — SQL с параметрами и вид результата (строки, count, exists).
+    Запись хранит версии всех таблиц из FROM и JOIN, с которыми она
+    прочитана, и после записи в любую из них не используется. Запись и
+    текущие версии читаются из кеша одним запросом.
+    """
+    if not settings.QUERY_CACHE_ENABLED:
+        return compute()
+    connection = connections[queryset.db]
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return compute()
+    raw = '|'.join((
+        connection.alias, str(connection.settings_dict['NAME']), kind,
+        queryset._iterable_class.__name__, repr(queryset._fields), sql,
+        repr(params)))
+    key = RESULT_KEY % hashlib.md5(raw.encode()).hexdigest()
+    found, versions = get_with_versions(
+        key, *(table_scope(table) for table in read_tables(sql)))
+    if found is not None and found[0] == versions:
+        registry.inc('yatube_query_cache_total', {'result': 'hit'})
+        return found[1]
+    registry.inc('yatube_query_cache_total', {'result': 'miss'})
+    result = compute()
+    if not _dirty(connection):
+        cache.set(key, (versions, result), queryset.cache_timeout)
+    return result
+
+
+class CachingQuerySet(models.QuerySet):
+    """QuerySet с кешем результатов по выбору: ``.cached()``.
+
+    Без ``cached()`` ведёт себя как обычный QuerySet. Закешированный
+    сбрасывается при записи в любую из прочитанных таблиц
+    (``track_writes``), так что TTL — лишь страховка.
+    """
+    cache_timeout = None
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone.cache_timeout = timeout or settings.QUERY_CACHE_TIMEOUT
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.cache_timeout = self.cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        # Строки namedtuple из values_list(named=True) — классы, созданные
+        # на лету, их не сохранить в кеш.
+        if self._result_cache is None and self.cache_timeout \
+                and self._iterable_class is not NamedValuesListIterable:
+            self._result_cache = fetch(
+                self, 'rows', lambda: list(self._iterable_class(self)))
+        super()._fetch_all()
+
+    def count(self):
+        if self._result_cache is not None or not self.cache_timeout:
+            return super().count()
+        return fetch(self, 'count', super().count)
+
+    def exists(self):
+        if self._result_cache is not None or not self.cache_timeout:
+            return super().exists()
+        return fetch(self, 'exists', super().exists)
+
+
+@lru_cache(maxsize=None)
+def _caching_class(queryset_class):
+    return type('Caching' + queryset_class.__name__,
+                (CachingQuerySet, queryset_class), {})
+
+
+def cached(queryset, timeout=None):
+    """``queryset.cached()`` для моделей с чужим менеджером (User)."""
+    if not isinstance(queryset, CachingQuerySet):
+        queryset = queryset._chain()
+        queryset.__class__ = _caching_class(type(queryset))
+    return queryset.cached(timeout)
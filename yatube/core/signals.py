@@ -0,0 +1,15 @@
+import os
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import RequestProfile
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_file_cleanup(sender, instance, **kwargs):
+    """Удалить файл профиля вместе с записью."""
+    path = os.path.join(settings.PROFILER_DIR, instance.stats_file)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .query_budget import WRAPPER_FILES, call_site
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+WRAPPER_FILES.add(__file__)
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+# Доля записей, после которых удаляются строки старше SLOW_QUERY_KEEP_DAYS.
+PRUNE_PROBABILITY = 0.01
+
+
+def install(sender, connection, **kwargs):
+    """Подключить перехватчик к соединению (сигнал connection_created).
+
+    Перехватчик встаёт в начало списка: ``execute_wrapper()`` снимает
+    последний элемент, и соединение, открытое внутри такого блока, иначе
+    лишилось бы чужой обёртки вместо своей.
+    """
+    if record_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_slow)
+
+
+def explain(connection, sql, params):
+    """План запроса как текст или пустая строка, если EXPLAIN неприменим."""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith(
+            ('SELECT', 'WITH')):
+        return ''
+    try:
+        # Точка сохранения: ошибка EXPLAIN не должна ломать транзакцию
+        # самого запроса (в PostgreSQL она стала бы непригодной).
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as error:
+        return 'EXPLAIN не выполнен: %s' % error
+
+
+def record_slow(execute, sql, params, many, context):
+    """Засечь запрос и записать его, если он дольше порога."""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or getattr(_local, 'busy', False):
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms >= threshold:
+        _local.busy = True
+        try:
+            _save(context['connection'], sql, params, many, duration_ms)
+        except Exception:
+            logger.exception('Медленный запрос не записан')
+        finally:
+            _local.busy = False
+    return result
+
+
+def _save(connection, sql, params, many, duration_ms):
+    """Записать медленный запрос в журнал и в SlowQuery.
+
+    Строка SlowQuery в транзакции запроса пропала бы при её откате, а
+    такие запросы нужнее всего. Поэтому внутри транзакции она
+    откладывается до выхода из неё: записывается при фиксации, а после
+    отката — в конце запроса (``flush_all``) или со следующим медленным
+    запросом вне транзакции.
+    """
+    site = call_site()
+    plan = '' if many else explain(connection, sql, params)
+    shown_params = [str(param) for param in params or ()]
+    logger.warning(
+        '%.1f ms %s\n  %s\n  params: %s\n%s', duration_ms, site, sql,
+        shown_params, plan,
+        extra={'duration_ms': duration_ms, 'site': site})
+    if not hasattr(connection, 'slow_queries_pending'):
+        connection.slow_queries_pending = []
+    connection.slow_queries_pending.append({
+        'duration_ms': duration_ms,
+        'fingerprint': hashlib.md5(sql.encode()).hexdigest(),
+        'sql': sql,
+        'params': repr(shown_params),
+        'site': site[:500],
+        'plan': plan,
+    })
+    if connection.in_atomic_block:
+        transaction.on_commit(
+            lambda: flush(connection), using=connection.alias)
+    else:
+        flush(connection)
+
+
+def flush(connection):
+    """Записать отложенные медленные запросы соединения."""
+    from .models import SlowQuery
+
+    pending = getattr(connection, 'slow_queries_pending', None)
+    if not pending:
+        return
+    connection.slow_queries_pending = []
+    busy, _local.busy = getattr(_local, 'busy', False), True
+    try:
+        with transaction.atomic(using=connection.alias):
+            SlowQuery.objects.using(connection.alias).bulk_create(
+                [SlowQuery(**fields) for fields in pending])
+            if random.random() < PRUNE_PROBABILITY:
+                cutoff = timezone.now() - timedelta(
+                    days=settings.SLOW_QUERY_KEEP_DAYS)
+                SlowQuery.objects.using(connection.alias).filter(
+                    created__lt=cutoff).delete()
+    except Exception:
+        logger.exception('Медленные запросы не записаны')
+    finally:
+        _local.busy = busy
+
+
+def flush_all(**kwargs):
+    """Сигнал request_finished: транзакции запроса уже зафиксированы или
+    откачены, отложенное можно записать."""
+    for connection in connections.all():
+        flush(connection)
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import donut
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    """Часть страницы для текущего зрителя.
+
+    Пока строится оболочка для кеша (``request.donut_shell``), вместо
+    неё выводится метка, которую ``donut.fill`` заполняет после чтения
+    из кеша; иначе дырка рисуется сразу.
+    """
+    request = context.get('request')
+    if getattr(request, 'donut_shell', False):
+        return mark_safe(donut.placeholder(name, kwargs))
+    return mark_safe(donut.render_hole(request, name, kwargs))
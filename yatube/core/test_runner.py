@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated_caches():
+    """Общий L2 кеша во временном каталоге на время прогона тестов.
+
+    Иначе тесты читают и очищают (``cache.clear()``) кеш запущенного
+    dev-сервера, а параллельные прогоны мешают друг другу.
+    """
+    location = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    caches = {alias: dict(options)
+              for alias, options in settings.CACHES.items()}
+    caches['shared'] = {
+        **caches['shared'],
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': location,
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_caches = isolated_caches()
+        self._isolated_caches.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_caches.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
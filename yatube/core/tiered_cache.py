@@ -0,0 +1,259 @@
+import fcntl
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .metrics import registry
+
+GENERATION_KEY = 'tiered-cache:generation'
+# Файл блокировки в каталоге файлового L2; FileBasedCache считает своими
+# только файлы *.djcache и не удаляет его при clear().
+LOCK_FILE = 'tiered-cache.lock'
+MISSING = object()
+
+# Локальные уровни процесса по LOCATION: экземпляр бэкенда у каждого
+# потока свой (как у LocMemCache), а L1 общий.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class LocalStore:
+    """L1: LRU в памяти процесса со сроком жизни записей.
+
+    Значения хранятся в pickle, как в LocMemCache: каждый читатель
+    получает свою копию, и закешированный ответ нельзя испортить,
+    дописав в него заголовок.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = None
+        self.checked = 0.0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            data, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, ttl):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (data, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: небольшой L1 в процессе перед общим L2.
+
+    L2 — другой кеш из ``CACHES`` (``OPTIONS['L2']``), общий для всех
+    рабочих процессов: файловый на хосте, memcached и т. п. Запись идёт
+    в оба уровня, чтение — сначала из L1.
+
+    В L1 запись живёт не дольше ``L1_TIMEOUT`` секунд. Свежесть
+    обеспечивают штампы версий: ключи страниц и фрагментов включают
+    версии областей (``posts.cache``), а сами ключи версий, начинающиеся
+    с ``L1_BYPASS``, всегда читаются из L2. ``clear()`` меняет поколение
+    в L2, и другие процессы сбрасывают свой L1, проверяя поколение не
+    реже раза в ``GENERATION_INTERVAL`` секунд.
+
+    ``add`` служит блокировкой между процессами (``posts.cache``), а
+    ``incr`` меняет версии областей (``core.versions``), поэтому обе
+    операции должны быть атомарными. У memcached и Redis они такие сами,
+    а у FileBasedCache это чтение и запись отдельными шагами: для него
+    ``add``, ``incr`` и ``decr`` выполняются под ``flock`` на файле в
+    каталоге кеша.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', 60)
+        self.bypass = tuple(options.get('L1_BYPASS', ()))
+        self.generation_interval = options.get('GENERATION_INTERVAL', 1.0)
+        with _stores_lock:
+            self.local = _stores.setdefault(
+                location, LocalStore(options.get('L1_MAX_ENTRIES', 1000)))
+
+    @property
+    def shared(self):
+        return caches[self.l2_alias]
+
+    @contextmanager
+    def _l2_lock(self):
+        """Исключительная блокировка L2 между процессами и потоками,
+        если сам L2 не умеет атомарно проверять и записывать."""
+        shared = self.shared
+        if not isinstance(shared, FileBasedCache):
+            yield
+            return
+        os.makedirs(shared._dir, exist_ok=True)
+        fd = os.open(os.path.join(shared._dir, LOCK_FILE),
+                     os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # flock принадлежит открытому файлу, а не процессу: потоки с
+            # разными дескрипторами тоже ждут друг друга.
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _l1_key(self, key, version):
+        if key.startswith(self.bypass):
+            return None
+        return self.shared.make_key(key, version=version)
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def _check_generation(self):
+        """Сбросить L1, если другой процесс очистил кеш."""
+        local = self.local
+        now = time.monotonic()
+        if now - local.checked < self.generation_interval:
+            return
+        local.checked = now
+        generation = self.shared.get(GENERATION_KEY)
+        if generation is None:
+            self.shared.add(GENERATION_KEY, time.time_ns(), None)
+            generation = self.shared.get(GENERATION_KEY)
+        if generation != local.generation:
+            local.clear()
+            local.generation = generation
+
+    def _remember(self, l1_key, value, timeout):
+        ttl = self._l1_ttl(timeout)
+        if l1_key is not None and ttl > 0:
+            self.local.set(l1_key, value, ttl)
+
+    def get(self, key, default=None, version=None):
+        self._check_generation()
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            value = self.local.get(l1_key)
+            if value is not MISSING:
+                registry.inc('yatube_cache_tier_total', {'tier': 'l1'})
+                return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            registry.inc('yatube_cache_tier_total', {'tier': 'miss'})
+            return default
+        registry.inc('yatube_cache_tier_total', {'tier': 'l2'})
+        self._remember(l1_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_generation()
+        found = {}
+        remote = []
+        for key in keys:
+            l1_key = self._l1_key(key, version)
+            value = MISSING if l1_key is None else self.local.get(l1_key)
+            if value is MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        fetched = self.shared.get_many(remote, version=version)
+        for key, value in fetched.items():
+            self._remember(self._l1_key(key, version), value, None)
+        found.update(fetched)
+        for tier, count in (('l1', len(keys) - len(remote)),
+                            ('l2', len(fetched)),
+                            ('miss', len(remote) - len(fetched))):
+            if count:
+                registry.inc('yatube_cache_tier_total', {'tier': tier}, count)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._l1_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._l2_lock():
+            added = self.shared.add(key, value, timeout, version=version)
+        l1_key = self._l1_key(key, version)
+        if added:
+            self._remember(l1_key, value, timeout)
+        elif l1_key is not None:
+            self.local.delete(l1_key)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version) or []
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self._l1_key(key, version), value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def _forget(self, key, version):
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            self.local.delete(l1_key)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._forget(key, version)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        for key in keys:
+            self._forget(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Версии областей меняются через incr: потерянное приращение —
+        # несброшенный кеш.
+        with self._l2_lock():
+            value = self.shared.incr(key, delta, version=version)
+        self._forget(key, version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        with self._l2_lock():
+            value = self.shared.decr(key, delta, version=version)
+        self._forget(key, version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def clear(self):
+        self.shared.clear()
+        self.shared.set(GENERATION_KEY, time.time_ns(), None)
+        self.local.clear()
+        self.local.checked = 0.0
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,252 @@
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+from .query_budget import call_site
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_installed = False
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL, кеш, шаблоны и произвольные участки."""
+
+    def __init__(self, detail=False):
+        self.started = time.perf_counter()
+        self.total = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_gets = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.spans = {}
+        # Какие обёртки сейчас выполняются: вложенные вызовы того же
+        # рода (get внутри get_many, include внутри шаблона) не
+        # считаются второй раз.
+        self.active = set()
+        # Подробные замеры (профилировщик): каждый SQL-запрос с местом
+        # вызова и каждый шаблон. Иначе None и ничего не копится.
+        self.queries = None
+        self.templates = None
+        if detail:
+            self.enable_detail()
+
+    def enable_detail(self):
+        if self.queries is None:
+            self.queries = []
+            self.templates = []
+
+    def add_span(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def fields(self):
+        """Поля для структурированного лога, время в миллисекундах."""
+        fields = {
+            'total_ms': round(self.total * 1000, 1),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 1),
+            'cache_gets': self.cache_gets,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+        for name, duration in self.spans.items():
+            fields[name + '_ms'] = round(duration * 1000, 1)
+        return fields
+
+    def header(self):
+        """Значение заголовка Server-Timing."""
+        metrics = [
+            'sql;dur=%.1f;desc="%d queries"' % (
+                self.sql_time * 1000, self.sql_count),
+            'cache;desc="%d hits, %d misses"' % (
+                self.cache_hits, self.cache_misses),
+        ]
+        metrics += [
+            '%s;dur=%.1f' % (name, duration * 1000)
+            for name, duration in self.spans.items()
+        ]
+        metrics.append('total;dur=%.1f' % (self.total * 1000))
+        return ', '.join(metrics)
+
+
+def current():
+    """Замеры текущего запроса или None, если он не попал в выборку."""
+    return getattr(_local, 'timing', None)
+
+
+@contextmanager
+def span(name):
+    """Засечь участок кода и добавить его к замерам текущего запроса.
+
+    Вне замеряемого запроса почти ничего не стоит.
+    """
+    timing = current()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_span(name, time.perf_counter() - start)
+
+
+def _outermost(kind, record):
+    """Обёртка, которая вызывает ``record`` только для внешнего вызова."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            timing = current()
+            if timing is None or kind in timing.active:
+                return method(*args, **kwargs)
+            timing.active.add(kind)
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                timing.active.discard(kind)
+            record(timing, args, kwargs, result, time.perf_counter() - start)
+            return result
+        wrapper.timing_wrapped = True
+        return wrapper
+    return decorator
+
+
+def _cache_get(timing, args, kwargs, result, duration):
+    timing.cache_gets += 1
+    default = args[2] if len(args) > 2 else kwargs.get('default')
+    if result is default:
+        timing.cache_misses += 1
+    else:
+        timing.cache_hits += 1
+
+
+def _cache_get_many(timing, args, kwargs, result, duration):
+    keys = list(args[1])
+    timing.cache_gets += len(keys)
+    timing.cache_hits += len(result)
+    timing.cache_misses += len(keys) - len(result)
+
+
+def _template(timing, args, kwargs, result, duration):
+    timing.add_span('template', duration)
+    if timing.templates is not None:
+        timing.templates.append({
+            'name': args[0].template.name,
+            'time': duration,
+        })
+
+
+def _patch(cls, name, kind, record):
+    method = getattr(cls, name)
+    if not getattr(method, 'timing_wrapped', False):
+        setattr(cls, name, _outermost(kind, record)(method))
+
+
+def install():
+    """Подключить замеры к классам кеша и шаблонов, один раз за процесс.
+
+    Патчатся классы, а не объекты: экземпляры кеша у каждого потока
+    свои. Пока запрос не замеряется, обёртки только проверяют, есть ли
+    текущие замеры.
+    """
+    global _installed
+    if _installed:
+        return
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _patch(backend, 'get', 'cache', _cache_get)
+        _patch(backend, 'get_many', 'cache', _cache_get_many)
+    _patch(Template, 'render', 'template', _template)
+    _installed = True
+
+
+def _record_sql(execute, sql, params, many, context):
+    timing = current()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timing is not None:
+            duration = time.perf_counter() - start
+            timing.sql_count += 1
+            timing.sql_time += duration
+            if timing.queries is not None:
+                timing.queries.append({
+                    'sql': sql,
+                    'params': [str(param) for param in params or ()],
+                    'time': duration,
+                    'site': call_site(skip=(__file__,)),
+                })
+
+
+@contextmanager
+def measure(detail=False):
+    """Замерять код внутри блока; вложенный вызов отдаёт внешние замеры.
+
+    Так Server-Timing, метрики и профилировщик делят одни замеры
+    запроса, а SQL перехватывается один раз.
+    """
+    timing = current()
+    if timing is not None:
+        if detail:
+            timing.enable_detail()
+        yield timing
+        return
+    install()
+    timing = _local.timing = RequestTiming(detail)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(_record_sql))
+            yield timing
+    finally:
+        _local.timing = None
+        timing.total = time.perf_counter() - timing.started
+
+
+class ServerTimingMiddleware:
+    """Замеры запроса в заголовке Server-Timing и в полях лога.
+
+    Замеряется доля SERVER_TIMING_SAMPLE_RATE запросов; при нуле
+    middleware отключается целиком и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        self.rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if not self.rate:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.rate < 1 and random.random() >= self.rate:
+            return self.get_response(request)
+        with measure() as timing:
+            response = self.get_response(request)
+        request.timing = timing
+        response['Server-Timing'] = timing.header()
+        match = getattr(request, 'resolver_match', None)
+        logger.info(
+            '%s %s %s %.1f ms', request.method, request.path,
+            response.status_code, timing.total * 1000,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                **timing.fields(),
+            })
+        return response
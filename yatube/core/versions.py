@@ -0,0 +1,58 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:%s'
+
+
+def _new_version():
+    # Версия от времени, а не с единицы: если ключ версии вытеснят из кеша,
+    # новая версия не совпадёт ни с одной из уже использованных.
+    return int(time.time() * 1000)
+
+
+def _versions(found, scopes):
+    """Версии ``scopes`` из прочитанного ``found``; недостающие заводятся."""
+    versions = []
+    for scope in scopes:
+        key = VERSION_KEY % scope
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def get_versions(*scopes):
+    """Текущие версии (поколения) областей кеша одним запросом."""
+    return _versions(
+        cache.get_many([VERSION_KEY % scope for scope in scopes]), scopes)
+
+
+def get_with_versions(key, *scopes):
+    """Значение ``key`` (или None) и версии ``scopes`` одним запросом."""
+    found = cache.get_many(
+        [key] + [VERSION_KEY % scope for scope in scopes])
+    return found.pop(key, None), _versions(found, scopes)
+
+
+def bump(*scopes):
+    """Сменить поколение областей: закешированное под ними устаревает."""
+    for scope in scopes:
+        key = VERSION_KEY % scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump_after_commit(*scopes):
+    """``bump`` сейчас и ещё раз после фиксации текущей транзакции.
+
+    Между ними конкурентный запрос может собрать страницу из ещё не
+    зафиксированных данных под новой версией; второй ``bump`` её сбросит.
+    """
+    bump(*scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump(*scopes))
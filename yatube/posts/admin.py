@@ -1,18 +1,129 @@
+import datetime
+import functools
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db import models
+from django.utils import timezone
 
+from . import search
 from .models import Group
 from .models import Post
 from .models import Comment
 from .models import Follow
+from .paginators import EstimatedCountPaginator
+
+
+def _next_period(date, kind):
+    if kind == 'year':
+        return date.replace(year=date.year + 1)
+    if kind == 'month':
+        return (date.replace(day=28) + datetime.timedelta(days=4)).replace(
+            day=1)
+    return date + datetime.timedelta(days=1)
+
+
+class IndexedDatesQuerySetMixin:
+    """``date_hierarchy`` без проходов по всей таблице.
+
+    Django берёт границы через MIN/MAX одним запросом и периоды через
+    SELECT DISTINCT по всем строкам. Здесь границы — два ORDER BY ...
+    LIMIT 1, а каждый период проверяется EXISTS по диапазону: всё идёт
+    по индексу поля даты.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if args or not kwargs or not all(
+                isinstance(aggregate, (models.Min, models.Max))
+                and isinstance(aggregate.get_source_expressions()[0],
+                               models.F)
+                for aggregate in kwargs.values()):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, aggregate in kwargs.items():
+            name = aggregate.get_source_expressions()[0].name
+            ordering = (
+                name if isinstance(aggregate, models.Min) else '-' + name)
+            result[alias] = (
+                self.filter(**{name + '__isnull': False})
+                .order_by(ordering).values_list(name, flat=True).first())
+        return result
+
+    def dates(self, field_name, kind, order='ASC'):
+        bounds = self.aggregate(
+            first=models.Min(field_name), last=models.Max(field_name))
+        if bounds['first'] is None:
+            return []
+        is_datetime = isinstance(
+            self.model._meta.get_field(field_name), models.DateTimeField)
+
+        def to_date(value):
+            if is_datetime:
+                value = timezone.localtime(value).date()
+            return value
+
+        def to_bound(date):
+            if is_datetime:
+                return timezone.make_aware(
+                    datetime.datetime.combine(date, datetime.time()))
+            return date
 
+        start = to_date(bounds['first'])
+        last = to_date(bounds['last'])
+        start = start.replace(
+            month=1 if kind == 'year' else start.month,
+            day=1 if kind in ('year', 'month') else start.day)
+        periods = []
+        while start <= last:
+            end = _next_period(start, kind)
+            if self.filter(**{
+                field_name + '__gte': to_bound(start),
+                field_name + '__lt': to_bound(end),
+            }).exists():
+                periods.append(start)
+            start = end
+        return periods if order == 'ASC' else periods[::-1]
 
-class PostAdmin(admin.ModelAdmin):
+
+@functools.lru_cache(maxsize=None)
+def _indexed_dates_class(queryset_class):
+    return type('Indexed' + queryset_class.__name__,
+                (IndexedDatesQuerySetMixin, queryset_class), {})
+
+
+class IndexedDatesChangeList(ChangeList):
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        queryset.__class__ = _indexed_dates_class(type(queryset))
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) и проходов по таблице ради дат."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return IndexedDatesChangeList
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group",)
-    list_editable = ('group',)
+    list_select_related = ("author", "group")
+    autocomplete_fields = ("author", "group")
     search_fields = ("text",)
+    # Фильтр по дате строится без запросов, в отличие от фильтров по тексту.
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всем постам ищем по полнотекстовому индексу.
+        # Все совпадения, а не первые SEARCH_MAX_RESULTS, как на сайте.
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
@@ -20,14 +131,19 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("post", "author", "text", "created")
-    list_filter = ("text", "created")
+    list_select_related = ("post", "author")
+    autocomplete_fields = ("post", "author")
+    date_hierarchy = "created"
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ("user", "author")
-    list_filter = ("user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+    # Точное совпадение имени идёт по уникальному индексу username.
+    search_fields = ("=user__username", "=author__username")
 
 
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,218 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (add_never_cache_headers, get_cache_key,
+                                has_vary_header, learn_cache_key,
+                                patch_response_headers)
+
+from core import donut
+from core.versions import bump, bump_after_commit, get_versions  # noqa: F401
+
+LOCK_KEY = 'page-lock:%s'
+# Как часто ждущий запрос заглядывает в кеш, пока страницу строит
+# другой процесс.
+POLL_INTERVAL = 0.05
+
+# Страницы, которые сейчас строятся в этом процессе: ключ блокировки ->
+# Event, который взводит строящий запрос.
+_building = {}
+_building_lock = threading.Lock()
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return 'group:%s' % group_id
+
+
+def author_scope(author_id):
+    return 'author:%s' % author_id
+
+
+def post_scope(post_id):
+    return 'post:%s' % post_id
+
+
+def post_scopes(post):
+    """Области, в которых виден пост: главная, его группа и автор."""
+    scopes = [index_scope(), author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def _card_scopes(post):
+    scopes = [author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def prefetch_card_versions(posts):
+    """Проставить постам ``card_versions`` для ключа кеша карточки.
+
+    В карточке есть имя автора и ссылка на группу, поэтому ключ включает
+    версии их областей: переименование автора или смена адреса группы
+    дают новую карточку. Версии всей страницы читаются одним запросом.
+    """
+    posts = list(posts)
+    scopes = sorted({
+        scope for post in posts for scope in _card_scopes(post)})
+    versions = dict(zip(scopes, get_versions(*scopes))) if scopes else {}
+    for post in posts:
+        post.card_versions = '.'.join(
+            str(versions[scope]) for scope in _card_scopes(post))
+    return posts
+
+
+def _cacheable(request, response):
+    """Те же условия, что у ``UpdateCacheMiddleware``; кешируется GET."""
+    if request.method != 'GET' or response.streaming \
+            or response.status_code != 200:
+        return False
+    if 'private' in response.get('Cache-Control', ()):
+        return False
+    return not (not request.COOKIES and response.cookies
+                and has_vary_header(response, 'Cookie'))
+
+
+def _stale(response):
+    """Устаревшую копию браузер не должен запоминать и проверять по ETag."""
+    if response.has_header('Expires'):
+        del response['Expires']
+    add_never_cache_headers(response)
+    return response
+
+
+def _fresh(found, versions):
+    """Ответ из записи кеша, если она построена с текущими версиями и не
+    истекла."""
+    if found is None:
+        return None
+    built_with, fresh_until, response = found
+    if built_with == versions and time.time() < fresh_until:
+        return response
+    return None
+
+
+def _wait_for(event, lookup):
+    """Ждать страницу, которую строит другой запрос, не дольше
+    ``PAGE_CACHE_LOCK_WAIT``; None, если так и не дождались."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while True:
+        response = lookup()
+        remaining = deadline - time.monotonic()
+        if response is not None or remaining <= 0:
+            return response
+        if event is not None:
+            event.wait(remaining)
+            event = None
+        else:
+            time.sleep(min(POLL_INTERVAL, remaining))
+
+
+def single_flight(lock_key, build, lookup, stale=None):
+    """Построить страницу одним запросом на все процессы.
+
+    Первый запрос берёт блокировку (Event в процессе и ``cache.add`` для
+    остальных процессов; атомарность ``add`` обеспечивает
+    ``core.tiered_cache``) и вызывает ``build``. Остальные получают
+    устаревшую копию ``stale``, а если её нет — ждут, пока ``lookup``
+    найдёт свежую. Не дождавшись, строят страницу сами.
+    """
+    with _building_lock:
+        event = _building.get(lock_key)
+        leader = event is None
+        if leader:
+            event = _building[lock_key] = threading.Event()
+    if not leader:
+        if stale is not None:
+            return _stale(stale)
+        return _wait_for(event, lookup) or build()
+    try:
+        if cache.add(lock_key, True, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            try:
+                # Предыдущий строящий мог закончить, пока мы брали
+                # блокировку.
+                return lookup() or build()
+            finally:
+                cache.delete(lock_key)
+        if stale is not None:
+            return _stale(stale)
+        return _wait_for(None, lookup) or build()
+    finally:
+        with _building_lock:
+            del _building[lock_key]
+        event.set()
+
+
+def cache_page_versioned(timeout, scopes):
+    """``cache_page``, который сбрасывается сменой версий областей ``scopes``.
+
+    ``scopes`` — список областей или функция от запроса и аргументов
+    view, которая его возвращает. Запись хранит версии, с которыми
+    построена страница; после ``bump`` любой из областей она устаревает,
+    поэтому TTL можно держать большим. Браузерам же отдаётся
+    ``max-age=0``: свежесть у них проверяется по ETag.
+
+    Кешируется оболочка страницы, общая для всех зрителей: части,
+    зависящие от пользователя (шапка, кнопки, форма с CSRF-токеном),
+    выводятся тегом ``{% hole %}`` как метки и заполняются для каждого
+    запроса после чтения из кеша (``core.donut``).
+
+    Промахи по одной странице не строят её параллельно (``single_flight``):
+    пока один запрос строит страницу, остальные получают устаревшую копию
+    (stale-while-revalidate), которая хранится ещё
+    ``PAGE_CACHE_STALE_TIMEOUT`` секунд после истечения ``timeout``.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            names = (scopes(request, *args, **kwargs) if callable(scopes)
+                     else scopes)
+            versions = get_versions(*names)
+            key_prefix = '.'.join(names)
+
+            def entry():
+                key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+                return cache.get(key) if key else None
+
+            def build():
+                request.donut_shell = True
+                try:
+                    response = view_func(request, *args, **kwargs)
+                finally:
+                    request.donut_shell = False
+                if _cacheable(request, response):
+                    stored_for = timeout + settings.PAGE_CACHE_STALE_TIMEOUT
+                    # Долгий TTL — только у записи на сервере: браузер
+                    # переспрашивает страницу каждый раз и получает 304
+                    # по ETag, пока версии не сменились.
+                    patch_response_headers(response, 0)
+                    key = learn_cache_key(
+                        request, response, stored_for, key_prefix,
+                        cache=cache)
+                    cache.set(key, (versions, time.time() + timeout,
+                                    response), stored_for)
+                return response
+
+            found = entry()
+            response = _fresh(found, versions)
+            if response is None:
+                lock_key = LOCK_KEY % hashlib.md5(
+                    (key_prefix + request.build_absolute_uri()).encode()
+                ).hexdigest()
+                response = single_flight(
+                    lock_key, build, lambda: _fresh(entry(), versions),
+                    stale=found[2] if found else None)
+            return donut.fill_response(request, response)
+        return _wrapped_view
+    return decorator
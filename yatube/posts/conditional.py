@@ -0,0 +1,138 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.views.decorators.http import condition
+
+from core.query_cache import cached
+
+from . import cache
+from .models import AuthorCounters, Comment, Follow, Group, Post
+
+
+def conditional_page(validators):
+    """``condition`` с ETag из функции ``validators``.
+
+    ``validators(request, *args, **kwargs)`` возвращает ETag. Если он
+    совпал с присланным клиентом, view не вызывается вовсе и ответ —
+    304 без рендеринга шаблона.
+
+    Last-Modified страницы не отдают: страница зависит от зрителя, а
+    правка или удаление поста не сдвигают дату вперёд, и клиент,
+    приславший только If-Modified-Since, получал бы 304 на устаревшее.
+    """
+    return condition(etag_func=validators)
+
+
+def make_etag(request, *parts):
+    """ETag страницы: зритель, параметры запроса и маркеры данных.
+
+    Страницы различаются для гостей и пользователей (шапка, кнопки),
+    поэтому зритель входит в ETag.
+    """
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = '|'.join(
+        str(part) for part in (user, request.GET.urlencode(), *parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _feed(request, posts, scopes):
+    """ETag ленты: последний пост по индексу даты и версии областей кеша.
+
+    Версии меняются при правке и удалении постов, которых не видно по
+    самому свежему посту.
+    """
+    latest = posts.order_by('-pub_date').values_list('pk', flat=True).first()
+    return make_etag(request, latest, *cache.get_versions(*scopes))
+
+
+def _lookup(request, key, query):
+    """Результат ``query()``, общий для валидаторов и областей кеша
+    страницы: за запрос выполняется один раз."""
+    lookups = request.__dict__.setdefault('_lookups', {})
+    if key not in lookups:
+        lookups[key] = query()
+    return lookups[key]
+
+
+def _group_id(request, slug):
+    return _lookup(request, ('group', slug), lambda: (
+        Group.objects.filter(slug=slug)
+        .values_list('pk', flat=True).first()))
+
+
+def _author(request, username):
+    return _lookup(request, ('author', username), lambda: (
+        AuthorCounters.objects.cached()
+        .filter(user__username=username)
+        .values_list('user_id', 'posts_count', 'followers_count',
+                     'following_count').first()))
+
+
+def _post(request, post_id):
+    return _lookup(request, ('post', post_id), lambda: (
+        Post.objects.filter(pk=post_id)
+        .values_list('author_id', 'updated', 'comments_count',
+                     'author__counters__posts_count').first()))
+
+
+def group_page_scopes(request, slug):
+    return [cache.group_scope(_group_id(request, slug))]
+
+
+def profile_page_scopes(request, username):
+    author = _author(request, username)
+    if author is not None:
+        return [cache.author_scope(author[0])]
+    # У автора ещё нет строки счётчиков.
+    author_id = cached(get_user_model().objects.filter(
+        username=username)).values_list('pk', flat=True).first()
+    return [cache.author_scope(author_id)]
+
+
+def post_page_scopes(request, post_id):
+    """Пост и его автор: на странице поста есть число постов автора."""
+    post = _post(request, post_id)
+    scopes = [cache.post_scope(post_id)]
+    if post is not None:
+        scopes.append(cache.author_scope(post[0]))
+    return scopes
+
+
+def index_validators(request):
+    return _feed(request, Post.objects.all(), [cache.index_scope()])
+
+
+def group_validators(request, slug):
+    group_id = _group_id(request, slug)
+    if group_id is None:
+        return None
+    return _feed(request, Post.objects.filter(group_id=group_id),
+                 [cache.group_scope(group_id)])
+
+
+def profile_validators(request, username):
+    author = _author(request, username)
+    if author is None:
+        return None
+    author_id, *counts = author
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author_id=author_id).exists())
+    etag = _feed(request, Post.objects.filter(author_id=author_id),
+                 [cache.author_scope(author_id)])
+    return make_etag(request, etag, following, *counts)
+
+
+def post_validators(request, post_id):
+    post = _post(request, post_id)
+    if post is None:
+        return None
+    author_id, updated, *counts = post
+    latest_comment = (
+        Comment.objects.filter(post_id=post_id).order_by('-created')
+        .values_list('created', flat=True).first())
+    # Версия автора: на странице его имя и число постов.
+    return make_etag(request, updated, latest_comment, *counts,
+                     *cache.get_versions(cache.post_scope(post_id),
+                                         cache.author_scope(author_id)))
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorCounters, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def for_user(user):
+    """Счётчики пользователя; строка создаётся при первом обращении."""
+    return AuthorCounters.objects.get_or_create(user_id=user.pk)[0]
+
+
+def add(user_id, field, delta):
+    """Атомарно изменить счётчик пользователя на ``delta``.
+
+    Строки нет — создаём её только при увеличении: уменьшение приходит
+    и при каскадном удалении самого пользователя.
+    """
+    expression = {field: Greatest(F(field) + delta, 0)}
+    counters = AuthorCounters.objects.filter(user_id=user_id)
+    if not counters.update(**expression) and delta > 0:
+        AuthorCounters.objects.get_or_create(user_id=user_id)
+        counters.update(**expression)
+
+
+def add_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def _grouped(queryset, field, ids):
+    return dict(
+        queryset.filter(**{field + '__in': ids})
+        .values_list(field).annotate(total=Count('pk')).order_by()
+    )
+
+
+def rebuild_users(ids):
+    """Пересчитать счётчики пользователей с первичными ключами ``ids``."""
+    posts = _grouped(Post.objects.all(), 'author', ids)
+    followers = _grouped(Follow.objects.all(), 'author', ids)
+    following = _grouped(Follow.objects.all(), 'user', ids)
+    with transaction.atomic():
+        existing = set(
+            AuthorCounters.objects.filter(user_id__in=ids)
+            .values_list('user_id', flat=True))
+        AuthorCounters.objects.bulk_create(
+            AuthorCounters(user_id=user_id)
+            for user_id in ids if user_id not in existing
+        )
+        AuthorCounters.objects.bulk_update(
+            [
+                AuthorCounters(
+                    user_id=user_id,
+                    posts_count=posts.get(user_id, 0),
+                    followers_count=followers.get(user_id, 0),
+                    following_count=following.get(user_id, 0),
+                )
+                for user_id in ids
+            ],
+            ['posts_count', 'followers_count', 'following_count'],
+        )
+
+
+def rebuild_posts(ids):
+    """Пересчитать число комментариев у постов с ключами ``ids``."""
+    comments = _grouped(Comment.objects.all(), 'post', ids)
+    with transaction.atomic():
+        Post.objects.bulk_update(
+            [
+                Post(pk=post_id, comments_count=comments.get(post_id, 0))
+                for post_id in ids
+            ],
+            ['comments_count'],
+        )
+
+
+def chunked_ids(queryset, size=None):
+    """Первичные ключи порциями по ``size`` с обходом по ключу, без OFFSET."""
+    size = size or settings.COUNTERS_CHUNK_SIZE
+    last = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        ids = list(chunk.values_list('pk', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
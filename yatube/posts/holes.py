@@ -0,0 +1,41 @@
+from django.template.loader import render_to_string
+
+from core.donut import hole
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('switcher')
+def switcher(request):
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@hole('follow_button')
+def follow_button(request, author_id, username):
+    user = request.user
+    following = (
+        user.is_authenticated and user.pk != author_id
+        and Follow.objects.filter(
+            user=user, author_id=author_id).exists())
+    return render_to_string('posts/includes/follow_button.html', {
+        'username': username,
+        'following': following,
+    }, request)
+
+
+@hole('comment_form')
+def comment_form(request, post_id):
+    return render_to_string('includes/comment_form.html', {
+        'post_id': post_id,
+        'form': CommentForm(),
+    }, request)
+
+
+@hole('edit_button')
+def edit_button(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string('posts/includes/edit_button.html', {
+        'post_id': post_id,
+    }, request)
@@ -0,0 +1,132 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+URLS = (
+    'admin:posts_post_changelist',
+    'admin:posts_comment_changelist',
+    'admin:posts_follow_changelist',
+    'admin:posts_group_changelist',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу большим набором данных и замеряет время и число '
+        'запросов списков админки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Замерять на данных, которые уже есть в базе',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз запрашивать каждую страницу',
+        )
+
+    def seed(self, options):
+        """Наполнить базу через bulk_create, минуя сигналы, и досчитать
+        то, что обычно делают сигналы."""
+        prefix = 'bench_%d_' % int(time.time())
+        with transaction.atomic():
+            User.objects.bulk_create(
+                (User(username=f'{prefix}{i}')
+                 for i in range(options['users'])),
+                batch_size=BATCH_SIZE)
+            Group.objects.bulk_create(
+                (Group(title=f'Группа {i}', slug=f'{prefix}{i}',
+                       description='-')
+                 for i in range(options['groups'])),
+                batch_size=BATCH_SIZE)
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .values_list('pk', flat=True))
+        group_ids = list(
+            Group.objects.filter(slug__startswith=prefix)
+            .values_list('pk', flat=True))
+        with transaction.atomic():
+            Post.objects.bulk_create(
+                (Post(text=f'Пост №{i}', author_id=random.choice(user_ids),
+                      group_id=random.choice(group_ids + [None]))
+                 for i in range(options['posts'])),
+                batch_size=BATCH_SIZE)
+        post_ids = list(
+            Post.objects.filter(author_id__in=user_ids)
+            .values_list('pk', flat=True))
+        with transaction.atomic():
+            Comment.objects.bulk_create(
+                (Comment(text=f'Комментарий №{i}',
+                         post_id=random.choice(post_ids),
+                         author_id=random.choice(user_ids))
+                 for i in range(options['comments'])),
+                batch_size=BATCH_SIZE)
+            pairs = {
+                tuple(random.sample(user_ids, 2))
+                for _ in range(options['follows'])
+            }
+            Follow.objects.bulk_create(
+                (Follow(user_id=user_id, author_id=author_id)
+                 for user_id, author_id in pairs),
+                batch_size=BATCH_SIZE)
+        # bulk_create не шлёт сигналов: счётчики, ленты и поиск —
+        # отдельными проходами, как в seed_data.
+        call_command('rebuild_counters', stdout=self.stdout)
+        for ids in counters.chunked_ids(
+                User.objects.filter(username__startswith=prefix)):
+            with transaction.atomic():
+                for user_id in ids:
+                    if timeline.uses_timeline(user_id):
+                        timeline.rebuild(user_id)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(
+            f'Добавлено: пользователей {len(user_ids)}, '
+            f'постов {options["posts"]}, комментариев '
+            f'{options["comments"]}, подписок {len(pairs)}')
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            self.seed(options)
+        admin, created = User.objects.get_or_create(
+            username='bench_admin',
+            defaults={'is_staff': True, 'is_superuser': True})
+        client = Client()
+        client.force_login(admin)
+        for name in URLS:
+            url = reverse(name)
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    self.stderr.write(f'{url}: {response.status_code}')
+                    break
+            else:
+                sql_time = sum(
+                    float(query['time']) for query in queries.captured_queries)
+                self.stdout.write(
+                    f'{url:<28} запросов {len(queries):>3}, медиана '
+                    f'{statistics.median(timings) * 1000:8.1f} мс, SQL '
+                    f'{sql_time * 1000:8.1f} мс')
@@ -0,0 +1,80 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+
+CACHE_METHODS = ('get', 'get_many', 'set', 'set_many')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поштучный поиск миниатюр страницы в KV-хранилище '
+        'sorl с пакетным prefetch'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=settings.FOR_PAGINATOR,
+            help='Сколько последних постов с картинками взять',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым прогоном',
+        )
+
+    def measure(self, func, posts, cold):
+        kv_cache = default.kvstore.cache
+        if cold:
+            kv_cache.clear()
+        trips = []
+
+        def counted(method):
+            def wrapper(*args, **kwargs):
+                # Локальные бэкенды реализуют get_many через get: считаем
+                # только внешний вызов, как одно обращение по сети.
+                trips.append(method.__name__)
+                with mock.patch.multiple(kv_cache, **originals):
+                    return method(*args, **kwargs)
+            return wrapper
+
+        originals = {name: getattr(kv_cache, name) for name in CACHE_METHODS}
+        with mock.patch.multiple(kv_cache, **{
+            name: counted(method) for name, method in originals.items()
+        }):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func(posts)
+                elapsed = time.perf_counter() - start
+        return len(trips), len(queries), elapsed
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.exclude(image='')
+            .order_by('-pub_date')[:options['posts']])
+        if not posts:
+            self.stderr.write('Нет постов с картинками')
+            return
+        for title, func in (
+            ('по одной', self.one_by_one),
+            ('prefetch', thumbnails.prefetch),
+        ):
+            trips, queries, elapsed = self.measure(
+                func, posts, options['cold'])
+            self.stdout.write(
+                f'{title:>10}: постов {len(posts)}, обращений к кешу '
+                f'{trips}, SQL-запросов {queries}, '
+                f'{elapsed * 1000:.2f} мс')
+
+    @staticmethod
+    def one_by_one(posts):
+        for post in posts:
+            for geometry in settings.POST_THUMBNAILS:
+                default.kvstore.get(
+                    thumbnails.thumbnail_file(post.image, geometry))
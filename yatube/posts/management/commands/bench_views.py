@@ -0,0 +1,205 @@
+import json
+import statistics
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from posts.models import AuthorCounters, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные страницы через WSGI-приложение и сохраняет '
+        'p50/p95/p99, число запросов к базе и пропускную способность в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько раз запрашивать каждую страницу',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замеров',
+        )
+        parser.add_argument(
+            '--only', action='append',
+            help='Замерять только эти сценарии; можно повторять',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output', default='bench_results.json',
+            help='Куда записать результаты',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Файл прошлого прогона: напечатать изменение p95',
+        )
+        parser.add_argument('--label', default='', help='Метка прогона')
+
+    def scenarios(self):
+        """Сценарий: имя -> (адрес, пользователь или None).
+
+        Страницы берутся на самых тяжёлых данных: горячий автор, самая
+        длинная ветка комментариев, самый активный подписчик.
+        """
+        hot = AuthorCounters.objects.order_by('-posts_count').first()
+        reader = AuthorCounters.objects.order_by('-following_count').first()
+        thread = Post.objects.order_by('-comments_count').first()
+        group = Group.objects.order_by('pk').first()
+        if not (hot and reader and thread and group):
+            raise CommandError('База пуста: сначала запустите seed_data')
+        cold = (
+            AuthorCounters.objects.filter(posts_count__gt=0)
+            .order_by('posts_count').first())
+        deep = max(1, Post.objects.count() // settings.FOR_PAGINATOR // 2)
+        word = thread.text.split()[-1]
+        return {
+            'index': (reverse('posts:index'), None),
+            'index_deep': (reverse('posts:index') + f'?page={deep}', None),
+            'group': (reverse('posts:group_list', args=(group.slug,)), None),
+            'profile_hot': (
+                reverse('posts:profile', args=(hot.user.username,)), None),
+            'profile_cold': (
+                reverse('posts:profile', args=(cold.user.username,)), None),
+            'post_detail_thread': (
+                reverse('posts:post_detail', args=(thread.pk,)), None),
+            'follow_index': (reverse('posts:follow_index'), reader.user),
+            'search': (
+                reverse('posts:post_search') + '?' + urlencode({'q': word}),
+                None),
+        }
+
+    def session_cookie(self, user):
+        """Cookie сессии вошедшего пользователя без формы входа."""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def request(self, application, url, cookie):
+        """Один GET через WSGI: код ответа, размер тела, число запросов."""
+        path, _, query = url.partition('?')
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query}
+        if cookie:
+            environ['HTTP_COOKIE'] = cookie
+        setup_testing_defaults(environ)
+        status = []
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            result = application(
+                environ, lambda code, headers, *args: status.append(code))
+            try:
+                size = sum(len(chunk) for chunk in result)
+            finally:
+                getattr(result, 'close', lambda: None)()
+        return int(status[0].split()[0]), size, queries
+
+    def measure(self, application, url, cookie, options):
+        for _ in range(options['warmup']):
+            self.request(application, url, cookie)
+        timings, queries, sizes = [], [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            start = time.perf_counter()
+            code, size, count = self.request(application, url, cookie)
+            timings.append(time.perf_counter() - start)
+            if code != 200:
+                raise CommandError(f'{url}: ответ {code}')
+            queries.append(count)
+            sizes.append(size)
+        timings.sort()
+        return {
+            'url': url,
+            'requests': len(timings),
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'mean_ms': statistics.mean(timings) * 1000,
+            'max_ms': timings[-1] * 1000,
+            'queries': statistics.mean(queries),
+            'max_queries': max(queries),
+            'bytes': statistics.mean(sizes),
+            'throughput_rps': len(timings) / sum(timings),
+        }
+
+    def compare(self, path, results):
+        with open(path) as file:
+            previous = json.load(file)['scenarios']
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before, after = previous[name]['p95_ms'], result['p95_ms']
+            self.stdout.write(
+                f'{name:<20} p95 {before:8.1f} -> {after:8.1f} мс '
+                f'({(after - before) / before * 100:+.0f}%)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        application = get_wsgi_application()
+        scenarios = self.scenarios()
+        names = options['only'] or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Нет сценариев: {", ".join(sorted(unknown))}')
+        results = {}
+        for name in names:
+            url, user = scenarios[name]
+            cookie = self.session_cookie(user) if user else None
+            result = results[name] = self.measure(
+                application, url, cookie, options)
+            self.stdout.write(
+                f'{name:<20} p50 {result["p50_ms"]:7.1f}  p95 '
+                f'{result["p95_ms"]:7.1f}  p99 {result["p99_ms"]:7.1f} мс  '
+                f'запросов {result["queries"]:5.1f}  '
+                f'{result["throughput_rps"]:7.1f} rps')
+        report = {
+            'label': options['label'],
+            'started': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'cold': options['cold'],
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Post, Comment, Follow, Group)
+            },
+            'scenarios': results,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'))
@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Признаки плохого плана: полный проход по таблице и сортировка в памяти.
+SQLITE_PROBLEMS = ('USE TEMP B-TREE',)
+POSTGRES_PROBLEMS = ('Seq Scan', 'Sort Method: external')
+# Страницы строятся заново: иначе кеши страниц и запросов прячут
+# запросы, и команда проверяет лишь валидаторы ETag.
+NO_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    for alias in ('default', 'shared')
+}
+
+
+def is_full_scan(line):
+    """Строка плана SQLite с полным проходом по таблице без индекса."""
+    line = line.strip()
+    return (line.startswith('SCAN ') and ' USING ' not in line
+            and 'VIRTUAL TABLE' not in line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает основные страницы и выполняет EXPLAIN для каждого их '
+        'SELECT, отмечая полные проходы по таблицам и сортировки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемные планы',
+        )
+
+    def urls(self):
+        """Страницы из posts/views.py на реальных данных из базы."""
+        post = Post.objects.filter(group__isnull=False).first()
+        commented = Comment.objects.order_by('-id').first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            raise CommandError(
+                'Нужны хотя бы один пост в группе и одна подписка')
+        detail = commented.post_id if commented else post.pk
+        return follow.user, [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': Group.objects.get(pk=post.group_id).slug}),
+            reverse('posts:profile',
+                    kwargs={'username': post.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': detail}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_search') + '?q=' + post.text.split()[0],
+        ]
+
+    def capture(self, client, url):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        return queries
+
+    def explain(self, sql, params):
+        if connection.vendor == 'sqlite':
+            prefix, problems = 'EXPLAIN QUERY PLAN ', SQLITE_PROBLEMS
+        elif connection.vendor == 'postgresql':
+            prefix, problems = 'EXPLAIN ', POSTGRES_PROBLEMS
+        else:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается')
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+        bad = [
+            line for line in plan
+            if any(problem in line for problem in problems)
+            or (connection.vendor == 'sqlite' and is_full_scan(line))
+        ]
+        return plan, bad
+
+    def handle(self, *args, **options):
+        user, urls = self.urls()
+        client = Client()
+        client.force_login(user)
+        problems = 0
+        for url in urls:
+            with override_settings(CACHES=NO_CACHES,
+                                   QUERY_CACHE_ENABLED=False):
+                queries = self.capture(client, url)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{url}: запросов {len(queries)}'))
+            for sql, params in queries:
+                plan, bad = self.explain(sql, params)
+                if not bad and not options['verbose_plans']:
+                    continue
+                problems += bool(bad)
+                style = self.style.WARNING if bad else str
+                self.stdout.write(style(f'  {sql[:200]}'))
+                for line in plan:
+                    mark = '!' if line in bad else ' '
+                    self.stdout.write(f'   {mark} {line}')
+        if problems:
+            message = f'Запросов с полным проходом или сортировкой: {problems}'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Полных проходов и сортировок не найдено'))
@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает группы, посты, комментарии и подписки в JSONL '
+        'или CSV, при желании сжимая в gzip'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', action='append', choices=list(exporter.EXPORTS),
+            help='Тип записей; можно повторять. По умолчанию группы, посты '
+                 'и подписки — то, что загружает import_posts',
+        )
+        parser.add_argument(
+            '--format', choices=exporter.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только посты и комментарии не старше даты (ISO 8601); '
+                 'группы и подписки выгружаются целиком',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='Файл для выгрузки; по умолчанию stdout. Расширение .gz '
+                 'включает сжатие',
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Сколько строк читать одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or bool(output and output.endswith('.gz'))
+        try:
+            since = options['since'] and exporter.parse_since(options['since'])
+            lines = exporter.lines(
+                options['type'] or list(exporter.DEFAULT_TYPES),
+                options['format'],
+                since or None, options['chunk_size'])
+        except ValueError as error:
+            raise CommandError(error)
+        sink = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for block in exporter.encoded(lines, compress):
+                sink.write(block)
+        finally:
+            if output:
+                sink.close()
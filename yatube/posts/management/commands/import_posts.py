@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.importer import RECORD_TYPES, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает группы, посты и подписки из JSONL или CSV '
+        'пакетами bulk_create с контрольной точкой для продолжения'
+    )
+    stealth_options = ('stdin',)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', nargs='?', default='-',
+            help='Файл с записями; «-» или без аргумента — stdin',
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат записей; по умолчанию по расширению файла',
+        )
+        parser.add_argument(
+            '--type', choices=RECORD_TYPES,
+            help='Тип записей CSV, если в файле нет колонки type',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько записей вставлять одним bulk_create',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько записей загружать в одной транзакции',
+        )
+        parser.add_argument(
+            '--start-at', type=int, default=None,
+            help='С какой записи начать (номер с нуля)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл, в котором хранится номер следующей записи после '
+                 'каждой завершённой транзакции',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы вместо пропуска',
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не обновлять ленты, счётчики и поисковый индекс; после '
+                 'загрузки нужны rebuild_counters и rebuild_search_index',
+        )
+
+    def open_source(self, options):
+        source = options['source']
+        fmt = options['format'] or (
+            'csv' if source.lower().endswith('.csv') else 'jsonl')
+        if source == '-':
+            return options.get('stdin', sys.stdin), fmt
+        try:
+            return open(source, encoding='utf-8', newline=''), fmt
+        except OSError as error:
+            raise CommandError(error)
+
+    def start_offset(self, options):
+        if options['start_at'] is not None:
+            return options['start_at']
+        checkpoint = options['checkpoint']
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                return int(file.read().strip() or 0)
+        return 0
+
+    @staticmethod
+    def save_checkpoint(path, offset):
+        """Записать смещение атомарно: сбой не оставит файл пустым."""
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(str(offset))
+        os.replace(temporary, path)
+
+    def handle(self, *args, **options):
+        batch_size, chunk_size = options['batch_size'], options['chunk_size']
+        if batch_size < 1 or chunk_size < 1:
+            raise CommandError('Размеры пакета и транзакции должны быть > 0')
+        offset = start = self.start_offset(options)
+        stream, fmt = self.open_source(options)
+        records = enumerate(
+            read_records(stream, fmt, options['type'], start), start)
+        importer = Importer(
+            create_missing=options['create_missing'],
+            derived=not options['skip_derived'])
+        started = time.perf_counter()
+        try:
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    for index in range(0, len(chunk), batch_size):
+                        importer.import_batch(
+                            chunk[index:index + batch_size])
+                    importer.finish_chunk()
+                offset = chunk[-1][0] + 1
+                if options['checkpoint']:
+                    self.save_checkpoint(options['checkpoint'], offset)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{offset}: {(offset - start) / elapsed:.0f} записей/с')
+        except ValueError as error:
+            raise CommandError(
+                f'{error}; загружены записи до {offset}, продолжить можно '
+                f'с --start-at {offset}')
+        finally:
+            if stream is not options.get('stdin', sys.stdin):
+                stream.close()
+        for line in importer.errors:
+            self.stderr.write(line)
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: групп {stats["group"]}, постов {stats["post"]}, '
+            f'подписок {stats["follow"]}, пропущено {stats["errors"]}, '
+            f'записей {offset - start}'))
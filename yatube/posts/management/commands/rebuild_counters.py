@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, '
+        'комментариев и подписок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Сколько строк пересчитывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        users = 0
+        for ids in counters.chunked_ids(User.objects.all(), size):
+            counters.rebuild_users(ids)
+            users += len(ids)
+        posts = 0
+        for ids in counters.chunked_ids(Post.objects.all(), size):
+            counters.rebuild_posts(ids)
+            posts += len(ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано: пользователей {users}, постов {posts}'))
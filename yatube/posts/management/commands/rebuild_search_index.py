@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import counters, search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов (SQLite FTS5)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Сколько постов индексировать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(
+                'Индекс PostgreSQL функциональный, перестраивать нечего')
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % search.FTS_TABLE)
+        total = 0
+        posts = Post.objects.all()
+        for ids in counters.chunked_ids(posts, options['chunk_size']):
+            with transaction.atomic():
+                search.index_posts(posts.filter(pk__in=ids).only('text'))
+            total += len(ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {total}'))
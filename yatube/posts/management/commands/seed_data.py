@@ -0,0 +1,211 @@
+import datetime
+import io
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import counters, timeline
+from posts.importer import create_posts
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+WORDS = (
+    'книга погода город дорога утро вечер музыка кино друг работа море '
+    'поезд сад кофе лес река письмо весна зима праздник'
+).split()
+
+
+def skewed(count, skew):
+    """Индекс от 0 до count - 1 со степенным перекосом к началу.
+
+    При skew = 1 распределение равномерное; при skew = 3 на первый
+    процент индексов приходится около пятой части выборок. Так
+    получаются «горячие» авторы и посты без списков весов в памяти.
+    """
+    return min(int(count * random.random() ** skew), count - 1)
+
+
+def heavy_tail(alpha, limit):
+    """Число из распределения Парето, не больше ``limit``."""
+    return min(int(random.paretovariate(alpha)), limit)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными с реалистичными '
+        'распределениями: степенной граф подписок, горячие авторы, посты '
+        'с картинками и длинные ветки комментариев'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument(
+            '--follows-alpha', type=float, default=1.2,
+            help='Показатель Парето для числа подписок пользователя',
+        )
+        parser.add_argument(
+            '--max-following', type=int, default=500,
+            help='Больше подписок у одного пользователя не бывает',
+        )
+        parser.add_argument(
+            '--author-skew', type=float, default=3.0,
+            help='Перекос выбора автора для подписок и постов',
+        )
+        parser.add_argument(
+            '--comments-alpha', type=float, default=1.1,
+            help='Показатель Парето для длины ветки комментариев',
+        )
+        parser.add_argument(
+            '--max-comments', type=int, default=5000,
+            help='Самая длинная ветка комментариев',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--chunk-size', type=int, default=20000,
+            help='Сколько строк вставлять в одной транзакции',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых наборов',
+        )
+
+    def log(self, message, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{message} за {elapsed:.1f} с')
+
+    def insert(self, model, objects, chunk_size, create=None):
+        """bulk_create (или ``create``) из генератора порциями в отдельных
+        транзакциях."""
+        create = create or model.objects.bulk_create
+        total = 0
+        while True:
+            chunk = [obj for _, obj in zip(range(chunk_size), objects)]
+            if not chunk:
+                return total
+            with transaction.atomic():
+                create(chunk, batch_size=BATCH_SIZE)
+            total += len(chunk)
+
+    def images(self, count=8):
+        """Несколько настоящих картинок, на которые ссылаются посты."""
+        names = []
+        for i in range(count):
+            buffer = io.BytesIO()
+            color = tuple(random.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 640), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed_{i}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def seed_users(self, options, prefix):
+        self.insert(User, (
+            User(username=f'{prefix}{i}', password='!')
+            for i in range(options['users'])
+        ), options['chunk_size'])
+        self.insert(Group, (
+            Group(title=f'Группа {i}', slug=f'{prefix}{i}', description='-')
+            for i in range(options['groups'])
+        ), options['chunk_size'])
+        # Порядок id задаёт популярность: первые авторы — самые горячие.
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('pk').values_list('pk', flat=True))
+        group_ids = list(
+            Group.objects.filter(slug__startswith=prefix)
+            .values_list('pk', flat=True))
+        return user_ids, group_ids
+
+    def follows(self, options, user_ids):
+        for user_id in user_ids:
+            count = heavy_tail(options['follows_alpha'],
+                               options['max_following'])
+            authors = {
+                user_ids[skewed(len(user_ids), options['author_skew'])]
+                for _ in range(count)
+            }
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def posts(self, options, user_ids, group_ids, images):
+        now = timezone.now()
+        seconds = options['days'] * 24 * 60 * 60
+        for i in range(options['posts']):
+            words = random.choices(WORDS, k=random.randint(3, 60))
+            yield Post(
+                text=f'Пост №{i}: ' + ' '.join(words),
+                author_id=user_ids[
+                    skewed(len(user_ids), options['author_skew'])],
+                group_id=random.choice(group_ids + [None]),
+                image=(random.choice(images)
+                       if random.random() < options['image_share'] else ''),
+                pub_date=now - datetime.timedelta(
+                    seconds=random.randrange(seconds)),
+            )
+
+    def comments(self, options, user_ids, first_post, last_post):
+        """Длина ветки по Парето: у большинства постов 0–2 комментария,
+        у немногих — тысячи.
+
+        Посты одного запуска вставлены подряд, поэтому их ключи идут от
+        ``first_post`` до ``last_post`` без пропусков.
+        """
+        for post_id in range(first_post, last_post + 1):
+            count = heavy_tail(options['comments_alpha'],
+                               options['max_comments']) - 1
+            for _ in range(count):
+                yield Comment(
+                    post_id=post_id,
+                    author_id=random.choice(user_ids),
+                    text=' '.join(random.choices(WORDS, k=5)),
+                )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        prefix = 'seed_%d_' % int(time.time())
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        user_ids, group_ids = self.seed_users(options, prefix)
+        self.log(f'Пользователей {len(user_ids)}', started)
+        follows = self.insert(
+            Follow, self.follows(options, user_ids), chunk_size)
+        self.log(f'Подписок {follows}', started)
+        last_pk = Post.objects.order_by('-pk').values_list('pk', flat=True)
+        first_post = (last_pk.first() or 0) + 1
+        self.insert(
+            Post, self.posts(options, user_ids, group_ids, self.images()),
+            chunk_size, create=create_posts)
+        last_post = last_pk.first() or 0
+        self.log(f'Постов {options["posts"]}', started)
+        comments = self.insert(Comment, self.comments(
+            options, user_ids, first_post, last_post), chunk_size)
+        self.log(f'Комментариев {comments}', started)
+        # bulk_create не шлёт сигналов: ленты, счётчики и поиск —
+        # отдельными проходами.
+        for ids in counters.chunked_ids(
+                User.objects.filter(username__startswith=prefix)):
+            with transaction.atomic():
+                for user_id in ids:
+                    timeline.rebuild(user_id)
+        self.log('Ленты собраны', started)
+        call_command('rebuild_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: префикс {prefix}, '
+            f'{time.perf_counter() - started:.1f} с'))
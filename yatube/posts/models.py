@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 
 from django.db import models
 
+from core.query_cache import CachingQuerySet
+
 User = get_user_model()
 
 
@@ -10,10 +12,26 @@ class Group(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
 
+    objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(CachingQuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом с постами."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """Пост со страницы поста.
+
+        Комментарии сюда не подгружаются: их может быть тысячи, страница
+        читает их порциями (``views.get_comments_page``).
+        """
+        return self.for_feed()
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -21,7 +39,12 @@ class Post(models.Model):
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
     )
     author = models.ForeignKey(
         User,
@@ -43,11 +66,25 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Под ленты автора и группы: фильтр по ключу и сортировка по дате.
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -72,9 +109,19 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
+    objects = CachingQuerySet.as_manager()
+
+    class Meta:
+        # Комментарии поста читаются в порядке добавления.
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -93,8 +140,58 @@ class Follow(models.Model):
         verbose_name='Подписаться'
     )
 
+    objects = CachingQuerySet.as_manager()
+
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=['follower', 'following'],
+            models.UniqueConstraint(fields=['user', 'author'],
                                     name='follow_unique'),
         ]
+
+
+class AuthorCounters(models.Model):
+    """Счётчики пользователя, обновляемые при создании и удалении."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    objects = CachingQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост автора у подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='timeline_unique'),
+        ]
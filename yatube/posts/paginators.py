@@ -0,0 +1,205 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CursorEncoder(json.JSONEncoder):
+    """Даты без потери микросекунд, в отличие от DjangoJSONEncoder."""
+
+    def default(self, o):
+        if hasattr(o, 'isoformat'):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage(Page):
+    """Страница курсорного паджинатора: знает только соседей, не общий счёт."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, number, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, number, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage %s>' % self.number
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return self.paginator.per_page * (self.number - 1) + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор по полям ``ordering`` (по умолчанию pub_date, id).
+
+    Не выполняет ``COUNT(*)`` и ``OFFSET``: каждая страница выбирается
+    условием по ключу последней записи предыдущей страницы, поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    @property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, number):
+        values = [getattr(obj, name) for name in self.fields]
+        raw = json.dumps([number] + values, cls=CursorEncoder)
+        return urlsafe_base64_encode(raw.encode())
+
+    def decode_cursor(self, token):
+        """Вернуть (номер страницы, значения ключа) или None."""
+        try:
+            number, *raw_values = json.loads(
+                urlsafe_base64_decode(token).decode())
+            opts = self.object_list.model._meta
+            values = [
+                opts.get_field(name).to_python(value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+            number = int(number)
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if len(values) != len(self.fields) or None in values or number < 1:
+            return None
+        return number, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в порядке выдачи (или до него)."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            descending = name.startswith('-') == forward
+            lookup = '%s__%s' % (field, 'lt' if descending else 'gt')
+            step = Q(**{lookup: values[position]})
+            for prev_name, prev_value in zip(self.fields[:position],
+                                             values[:position]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def get_page(self, after=None, before=None):
+        """Вернуть страницу после курсора ``after`` или до ``before``.
+
+        Неразборчивый курсор означает первую страницу.
+        """
+        cursor = None
+        forward = True
+        if after:
+            cursor = self.decode_cursor(after)
+        elif before:
+            cursor = self.decode_cursor(before)
+            forward = False
+        if cursor is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return self._build_page(rows[:self.per_page], 1,
+                                    more_after=len(rows) > self.per_page,
+                                    more_before=False)
+        number, values = cursor
+        queryset = self.object_list.filter(self._seek(values, forward))
+        if forward:
+            rows = list(queryset[:self.per_page + 1])
+            return self._build_page(rows[:self.per_page], number,
+                                    more_after=len(rows) > self.per_page,
+                                    more_before=True)
+        queryset = queryset.order_by(*self._reversed_ordering())
+        rows = list(queryset[:self.per_page + 1])
+        more_before = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._build_page(rows, number if more_before else 1,
+                                more_after=True, more_before=more_before)
+
+    def _build_page(self, rows, number, more_after, more_before):
+        next_cursor = previous_cursor = None
+        if rows and more_after:
+            next_cursor = self.encode_cursor(rows[-1], number + 1)
+        if rows and more_before:
+            previous_cursor = self.encode_cursor(rows[0],
+                                                 max(number - 1, 1))
+        return CursorPage(rows, number, self,
+                          next_cursor=next_cursor,
+                          previous_cursor=previous_cursor)
+
+
+def estimate_count(model, using='default'):
+    """Примерное число строк таблицы модели без COUNT(*) или None.
+
+    PostgreSQL берёт оценку планировщика из статистики, SQLite —
+    наибольший первичный ключ (удалённые строки его не уменьшают).
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+        params = [model._meta.db_table]
+    elif connection.vendor == 'sqlite':
+        sql = 'SELECT MAX(%s) FROM %s' % (
+            connection.ops.quote_name(model._meta.pk.column), table)
+        params = []
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор админки: без фильтров число строк берётся оценкой.
+
+    Точный COUNT(*) остаётся для отфильтрованных списков и для таблиц
+    меньше ``ESTIMATED_COUNT_THRESHOLD`` строк.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_count(
+                self.object_list.model, self.object_list.db)
+            if (estimate is not None
+                    and estimate >= settings.ESTIMATED_COUNT_THRESHOLD):
+                return estimate
+        return super().count
+
+
+def page_window(page, size):
+    """Номера страниц вокруг текущей, не больше ``size`` с каждой стороны."""
+    if getattr(page, 'is_cursor', False):
+        return range(page.number, page.number + 1)
+    first = max(page.number - size, 1)
+    last = min(page.number + size, page.paginator.num_pages)
+    return range(first, last + 1)
@@ -0,0 +1,184 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+PG_CONFIG = 'russian'
+
+WORD = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+# Окончания алгоритма Snowball для русского языка. Альтернативы
+# проверяются слева направо, поэтому выигрывает самое длинное окончание.
+PERFECTIVE_GERUND = re.compile(
+    r'(ив|ивши|ившись|ыв|ывши|ывшись|(?<=[ая])(в|вши|вшись))$')
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'(ивш|ывш|ующ|(?<=[ая])(ем|нн|вш|ющ|щ))$')
+VERB = re.compile(
+    r'(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено'
+    r'|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю'
+    r'|(?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'(ост|ость)$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+I_ENDING = re.compile(r'и$')
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная + согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, word):
+    match = pattern.search(word)
+    if match is None:
+        return word, False
+    return word[:match.start()], True
+
+
+# Слова в текстах повторяются, а массовая индексация стеммит их миллионами.
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа русского слова по алгоритму Snowball (Porter)."""
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS), None)
+    if rv_start is None:
+        return word
+    r2_start = _region(word, _region(word))
+    head, rv = word[:rv_start], word[rv_start:]
+
+    rv, found = _cut(PERFECTIVE_GERUND, rv)
+    if not found:
+        rv, _ = _cut(REFLEXIVE, rv)
+        rv, found = _cut(ADJECTIVE, rv)
+        if found:
+            rv, _ = _cut(PARTICIPLE, rv)
+        else:
+            rv, found = _cut(VERB, rv)
+            if not found:
+                rv, _ = _cut(NOUN, rv)
+    rv, _ = _cut(I_ENDING, rv)
+
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rv, found = _cut(SUPERLATIVE, rv)
+        if found and rv.endswith('нн'):
+            rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def terms(text):
+    """Основы слов текста в порядке появления."""
+    return [stem(word) for word in WORD.findall(text or '')]
+
+
+def _sqlite():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы из строки поиска, каждая в кавычках."""
+    return ' '.join(
+        '"%s"' % term.replace('"', '""') for term in terms(query))
+
+
+def index_posts(posts):
+    """Добавить или обновить посты в полнотекстовом индексе SQLite.
+
+    Для PostgreSQL индекс функциональный и обновляется сам.
+    """
+    if not _sqlite():
+        return
+    rows = [(post.pk, ' '.join(terms(post.text))) for post in posts]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE,
+            [(pk,) for pk, _ in rows])
+        cursor.executemany(
+            'INSERT INTO %s (rowid, body) VALUES (%%s, %%s)' % FTS_TABLE,
+            rows)
+
+
+def unindex_posts(post_ids):
+    if not _sqlite():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE,
+            [(pk,) for pk in post_ids])
+
+
+def filter_posts(queryset, query):
+    """Все посты ``queryset``, подходящие под запрос, без ранжирования и
+    без ограничения ``SEARCH_MAX_RESULTS`` (для админки)."""
+    if _sqlite():
+        expression = match_expression(query)
+        if not expression:
+            return queryset.none()
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return queryset.extra(
+            where=['%s.id IN (SELECT rowid FROM %s WHERE %s MATCH %%s)'
+                   % (table, FTS_TABLE, FTS_TABLE)],
+            params=[expression])
+
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+
+    if not WORD.search(query or ''):
+        return queryset.none()
+    return queryset.annotate(
+        search=SearchVector('text', config=PG_CONFIG),
+    ).filter(search=SearchQuery(query, config=PG_CONFIG))
+
+
+def post_ids(query, limit=None):
+    """id постов, подходящих под запрос, от самых релевантных.
+
+    Отдаётся не больше ``SEARCH_MAX_RESULTS`` id: ранжирование и
+    усечение выполняет сам индекс, таблица постов не сканируется.
+    """
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    if _sqlite():
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM %s WHERE %s MATCH %%s '
+                'ORDER BY rank LIMIT %%s' % (FTS_TABLE, FTS_TABLE),
+                [expression, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    from django.contrib.postgres.search import (
+        SearchQuery, SearchRank, SearchVector)
+
+    from .models import Post
+
+    if not WORD.search(query or ''):
+        return []
+    vector = SearchVector('text', config=PG_CONFIG)
+    search_query = SearchQuery(query, config=PG_CONFIG)
+    # Выражение совпадает с функциональным GIN-индексом из миграции.
+    return list(
+        Post.objects.annotate(
+            search=vector, rank=SearchRank(vector, search_query))
+        .filter(search=search_query)
+        .order_by('-rank', '-pub_date')
+        .values_list('pk', flat=True)[:limit])
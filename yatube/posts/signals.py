@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import background
+
+from . import cache, counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        background.run(timeline.fan_out, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        background.run(timeline.backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    instance._previous_text = None
+    if instance.pk:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image', 'text').first()
+        )
+        if previous:
+            (instance._previous_group_id, instance._previous_image,
+             instance._previous_text) = previous
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_invalidate(sender, instance, **kwargs):
+    scopes = cache.post_scopes(instance)
+    scopes.append(cache.post_scope(instance.pk))
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id and previous_group_id != instance.group_id:
+        scopes.append(cache.group_scope(previous_group_id))
+    cache.bump_after_commit(*scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_invalidate(sender, instance, **kwargs):
+    cache.bump_after_commit(
+        cache.index_scope(), cache.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_invalidate(sender, instance, **kwargs):
+    cache.bump_after_commit(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_invalidate(sender, instance, **kwargs):
+    # Счётчики подписчиков и подписок видны в профилях обоих.
+    cache.bump_after_commit(cache.author_scope(instance.author_id),
+                            cache.author_scope(instance.user_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_invalidate(sender, instance, created, update_fields=None,
+                    **kwargs):
+    # Вход пользователя сохраняет только last_login, которого не видно.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    scopes = [cache.author_scope(instance.pk)]
+    if not created:
+        # Имя автора есть в карточках его постов на главной и в группах.
+        scopes.append(cache.index_scope())
+        scopes.extend(cache.group_scope(group_id) for group_id in (
+            Post.objects.filter(author_id=instance.pk, group__isnull=False)
+            .order_by().values_list('group_id', flat=True).distinct()))
+    cache.bump_after_commit(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, **kwargs):
+    if created:
+        counters.add(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.add(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, **kwargs):
+    if created:
+        counters.add_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.add_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, **kwargs):
+    if created:
+        counters.add(instance.author_id, 'followers_count', 1)
+        counters.add(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncount(sender, instance, **kwargs):
+    counters.add(instance.author_id, 'followers_count', -1)
+    counters.add(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_resume(sender, instance, **kwargs):
+    # После follow_uncount: решение принимается по новому счётчику.
+    background.run(timeline.resume, instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, created, **kwargs):
+    previous_image = getattr(instance, '_previous_image', '')
+    if instance.image.name == previous_image and not created:
+        return
+    if previous_image:
+        background.run(thumbnails.cleanup, previous_image)
+    if instance.image:
+        background.run(thumbnails.generate, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_thumbnails_cleanup(sender, instance, **kwargs):
+    if instance.image:
+        background.run(thumbnails.cleanup, instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_search_index(sender, instance, **kwargs):
+    if instance.text != getattr(instance, '_previous_text', None):
+        search.index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def post_search_unindex(sender, instance, **kwargs):
+    search.unindex_posts([instance.pk])
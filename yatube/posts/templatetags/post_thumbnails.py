@@ -0,0 +1,35 @@
+from django import template
+from django.core.cache import cache
+from sorl.thumbnail import default
+
+from core import background
+
+from .. import thumbnails
+
+register = template.Library()
+
+SCHEDULE_TIMEOUT = 60 * 5
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry):
+    """URL готовой миниатюры картинки поста.
+
+    Шаблон не строит миниатюру сам: если её ещё нет, генерация уходит
+    в фон, а пока отдаётся исходная картинка.
+    """
+    if not post.image:
+        return ''
+    prefetched = getattr(post, 'prefetched_thumbnails', {})
+    if geometry in prefetched:
+        thumbnail, cached = prefetched[geometry]
+    else:
+        thumbnail = thumbnails.thumbnail_file(post.image, geometry)
+        cached = default.kvstore.get(thumbnail)
+    if cached is not None:
+        return cached.url
+    # Не ставим генерацию повторно, пока предыдущая не успела отработать.
+    if cache.add('thumbnail-scheduled:%s' % thumbnail.name, True,
+                 SCHEDULE_TIMEOUT):
+        background.schedule(thumbnails.generate, post.pk)
+    return post.image.url
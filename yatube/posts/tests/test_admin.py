@@ -0,0 +1,80 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import search
+from ..admin import IndexedDatesQuerySetMixin, _indexed_dates_class
+from ..models import Post
+
+User = get_user_model()
+
+DATES = (
+    (2020, 1, 31, 23), (2020, 2, 1, 0), (2020, 2, 1, 12),
+    (2021, 12, 31, 22), (2023, 6, 15, 10),
+)
+
+
+class IndexedDatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        for i, (year, month, day, hour) in enumerate(DATES):
+            post = Post.objects.create(text=f'Пост №{i}', author=cls.user)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(
+                    datetime.datetime(year, month, day, hour)))
+
+    def indexed(self, queryset):
+        queryset.__class__ = _indexed_dates_class(type(queryset))
+        self.assertIsInstance(queryset, IndexedDatesQuerySetMixin)
+        return queryset
+
+    def test_dates_match_django(self):
+        """Периоды и границы совпадают с выборкой Django."""
+        for kind in ('year', 'month', 'day'):
+            for queryset in (
+                Post.objects.all(),
+                Post.objects.filter(pub_date__year=2020),
+            ):
+                with self.subTest(kind=kind, query=str(queryset.query)):
+                    self.assertEqual(
+                        list(self.indexed(queryset.all()).dates(
+                            'pub_date', kind, order='DESC')),
+                        list(queryset.dates(
+                            'pub_date', kind, order='DESC')))
+
+    def test_changelist_date_hierarchy(self):
+        """Список постов в админке строит иерархию дат по годам."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('admin:posts_post_changelist'))
+        for year in (2020, 2021, 2023):
+            self.assertContains(response, f'pub_date__year={year}')
+        self.assertNotContains(response, 'pub_date__year=2022')
+
+
+class PostSearchAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        Post.objects.bulk_create(
+            [Post(text=f'Путешествия №{i}', author=cls.user)
+             for i in range(5)])
+        search.index_posts(Post.objects.all())
+
+    @override_settings(SEARCH_MAX_RESULTS=2)
+    def test_search_is_not_truncated(self):
+        """Поиск в админке находит все посты, а не первые
+        SEARCH_MAX_RESULTS."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'путешествие'})
+        self.assertEqual(response.context['cl'].result_count, 5)
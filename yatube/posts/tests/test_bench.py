@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import AuthorCounters, Comment, Post, TimelineEntry
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedAndBenchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=30, groups=3, posts=200, seed=1,
+            stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_seed_is_skewed_and_consistent(self):
+        """Горячие авторы, картинки и ленты; счётчики сходятся."""
+        self.assertEqual(Post.objects.count(), 200)
+        top = AuthorCounters.objects.order_by('-posts_count')
+        self.assertGreater(top[0].posts_count, 200 / 30 * 3)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)),
+            Comment.objects.count())
+
+    def test_bench_writes_results(self):
+        output = os.path.join(TEMP_MEDIA_ROOT, 'results.json')
+        call_command('bench_views', requests=3, warmup=0, output=output,
+                     stdout=StringIO())
+        with open(output) as file:
+            report = json.load(file)
+        self.assertIn('follow_index', report['scenarios'])
+        for result in report['scenarios'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries'], 0)
+
+
+class BenchAdminTests(TestCase):
+    def test_seed_keeps_derived_data_consistent(self):
+        """Наполнение для замеров админки не ломает счётчики и ленты."""
+        call_command(
+            'bench_admin', users=10, groups=2, posts=50, comments=20,
+            follows=15, repeat=1, stdout=StringIO(), stderr=StringIO())
+        for counters in AuthorCounters.objects.select_related('user'):
+            user = counters.user
+            self.assertEqual(counters.posts_count, user.posts.count())
+            self.assertEqual(counters.following_count,
+                             user.follower.count())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)),
+            Comment.objects.count())
+        followed_posts = Post.objects.filter(
+            author__following__isnull=False).count()
+        self.assertEqual(TimelineEntry.objects.count(), followed_posts)
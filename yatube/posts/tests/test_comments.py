@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Популярный пост',
+            author=User.objects.create_user(username='author'),
+        )
+        cls.comments = [
+            Comment.objects.create(
+                text=f'Комментарий №{i}',
+                author=User.objects.create_user(username=f'reader_{i}'),
+                post=cls.post,
+            )
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:post_comments', args=(self.post.pk,))
+
+    def test_detail_renders_first_page(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:5])
+        self.assertContains(response, f'{self.url}?after=')
+        self.assertNotContains(response, self.comments[5].text)
+
+    def test_fragments_walk_all_comments(self):
+        """Фрагменты по курсору отдают все комментарии по порядку."""
+        seen = []
+        params = {}
+        while True:
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, params)
+            page = response.context['comments']
+            seen.extend(page)
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, self.comments)
+        self.assertTemplateUsed(response, 'posts/includes/comments_page.html')
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_json_format(self):
+        """JSON-вариант отдаёт порцию и ссылку на следующую."""
+        data = self.client.get(self.url, {'format': 'json'}).json()
+        self.assertEqual(
+            [item['id'] for item in data['results']],
+            [comment.pk for comment in self.comments[:5]])
+        self.assertEqual(data['results'][0]['author'], 'reader_0')
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['results'][0]['id'], self.comments[5].pk)
@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils.http import http_date
+
+from .. import cache as page_cache
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', password='password')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_304(self):
+        """Повторный запрос с тем же ETag получает 304 без тела."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('ETag', response)
+                self.assertNotIn('Last-Modified', response)
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_browsers_revalidate_cached_pages(self):
+        """Долгий TTL кеша страниц не уходит в браузер."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                for response in (self.client.get(url), self.client.get(url)):
+                    self.assertEqual(response['Cache-Control'], 'max-age=0')
+
+    def test_not_modified_skips_rendering(self):
+        """Ответ 304 отдаётся до выборки постов и шаблона."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.client.get(url)
+        with self.assertNumQueries(2):
+            again = self.revalidate(url, response)
+        self.assertIsNone(again.context)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост, правка и комментарий меняют ETag."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, response in responses.items():
+            with self.subTest(url=url, change='edit'):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200)
+
+        detail = self.urls[-1]
+        response = self.client.get(detail)
+        Comment.objects.create(
+            text='Комментарий', author=self.reader, post=self.post)
+        self.assertEqual(self.revalidate(detail, response).status_code, 200)
+
+        index = self.urls[0]
+        response = self.client.get(index)
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.revalidate(index, response).status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь получают разные ETag."""
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    self.revalidate(url, response, reader_client).status_code,
+                    200)
+
+    def test_if_modified_since_ignored(self):
+        """Без ETag страница отдаётся целиком: по дате не видно правок,
+        удалений и смены зрителя."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=http_date())
+                self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_invalidates_etags(self):
+        """Имя автора есть на всех страницах с его постами."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 200)
+                self.assertContains(again, 'Новое имя')
+
+    def test_login_keeps_etags(self):
+        """Вход пользователя меняет только last_login и страниц не
+        сбрасывает."""
+        response = self.client.get(self.urls[2])
+        self.assertTrue(
+            Client().login(username='author', password='password'))
+        self.assertEqual(
+            self.revalidate(self.urls[2], response).status_code, 304)
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class VersionBumpTests(TransactionTestCase):
+    def test_bumped_again_after_commit(self):
+        """Страница, собранная до фиксации правки, устаревает после неё."""
+        author = User.objects.create_user(username='author')
+        scope = page_cache.index_scope()
+        with transaction.atomic():
+            before = page_cache.get_versions(scope)
+            Post.objects.create(text='Пост', author=author)
+            in_transaction = page_cache.get_versions(scope)
+            self.assertNotEqual(in_transaction, before)
+        self.assertNotEqual(page_cache.get_versions(scope), in_transaction)
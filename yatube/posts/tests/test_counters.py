@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorCounters, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Post.objects.create(text='Ещё пост', author=cls.author)
+        Comment.objects.create(
+            text='Комментарий', post=cls.post, author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCounters(self, user, posts, followers, following):
+        counters = AuthorCounters.objects.get(user=user)
+        self.assertEqual(
+            (counters.posts_count, counters.followers_count,
+             counters.following_count),
+            (posts, followers, following))
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        self.assertCounters(self.author, 2, 1, 0)
+        self.assertCounters(self.reader, 0, 0, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+        Follow.objects.filter(user=self.reader).delete()
+        Comment.objects.all().delete()
+        Post.objects.filter(text='Ещё пост').delete()
+        self.assertCounters(self.author, 1, 0, 0)
+        self.assertCounters(self.reader, 0, 0, 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters восстанавливает испорченные счётчики."""
+        AuthorCounters.objects.update(
+            posts_count=99, followers_count=99, following_count=99)
+        Post.objects.update(comments_count=99)
+        call_command('rebuild_counters', chunk_size=1, stdout=open(
+            '/dev/null', 'w'))
+        self.assertCounters(self.author, 2, 1, 0)
+        self.assertCounters(self.reader, 0, 0, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_pages_show_counts_without_count_queries(self):
+        """Профиль и пост показывают счётчики без COUNT(*)."""
+        urls = (
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertContains(response, '2')
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class DonutCacheTests(TestCase):
+    """Оболочка страницы общая, части для зрителя заполняются каждый раз."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='<!--donut:WyJoZWFkZXIiLCB7fV0=--> пост',
+            author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'<!--donut:', response.content)
+        return response
+
+    def test_header_is_not_shared_between_viewers(self):
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=(self.group.slug,))):
+            with self.subTest(url=url):
+                self.get(self.author_client, url)
+                guest = self.get(self.guest, url)
+                self.assertNotIn('page_obj', guest.context)
+                self.assertNotContains(guest, 'Пользователь: author')
+                self.assertContains(guest, 'Войти')
+                self.assertContains(
+                    self.get(self.reader_client, url), 'Пользователь: reader')
+
+    def test_follow_button_per_viewer(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.assertContains(self.get(self.reader_client, url), 'Отписаться')
+        guest = self.get(self.guest, url)
+        self.assertNotIn('page_obj', guest.context)
+        self.assertContains(guest, 'Подписаться')
+        self.assertContains(guest, 'Подписчиков: 1')
+
+    def test_follow_invalidates_profile(self):
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.assertContains(self.get(self.guest, url), 'Подписчиков: 0')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.get(self.guest, url), 'Подписчиков: 1')
+
+    def test_post_detail_holes(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        guest = self.get(self.guest, url)
+        self.assertNotContains(guest, 'csrfmiddlewaretoken')
+        reader = self.get(self.reader_client, url)
+        self.assertNotIn('comments', reader.context)
+        self.assertContains(reader, 'csrfmiddlewaretoken')
+        self.assertNotContains(reader, 'редактировать запись')
+        self.assertContains(
+            self.get(self.author_client, url), 'редактировать запись')
+
+    def test_marker_in_user_text_is_escaped(self):
+        response = self.get(
+            self.guest, reverse('posts:post_detail', args=(self.post.pk,)))
+        self.assertContains(response, '&lt;!--donut:', count=2)
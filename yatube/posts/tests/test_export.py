@@ -0,0 +1,104 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Книги', slug='books', description='О книгах')
+        cls.old = Post.objects.create(
+            text='Старый пост', author=cls.author, group=cls.group)
+        cls.old_date = timezone.make_aware(datetime.datetime(2015, 1, 1))
+        Post.objects.filter(pk=cls.old.pk).update(pub_date=cls.old_date)
+        cls.new = Post.objects.create(text='Новый пост', author=cls.author)
+        Comment.objects.create(post=cls.new, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir='.')
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def export(self, name, *args):
+        path = os.path.join(self.dir, name)
+        call_command('export_posts', '--output', path, *args)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as file:
+            return file.read()
+
+    def test_jsonl_round_trips_through_import(self):
+        """Выгрузка в gzip загружается import_posts обратно."""
+        body = self.export('all.jsonl.gz', '--chunk-size', '1')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['group', 'post', 'post', 'follow'])
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        Group.objects.all().delete()
+        errors = StringIO()
+        call_command('import_posts', stdin=StringIO(body),
+                     stdout=StringIO(), stderr=errors)
+        self.assertEqual(errors.getvalue(), '')
+        self.assertEqual(
+            set(Post.objects.values_list('text', 'group__slug', 'pub_date')),
+            {('Старый пост', 'books', self.old_date),
+             ('Новый пост', None, self.new.pub_date)})
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists())
+
+    def test_comments_only_on_request(self):
+        """Комментарии выгружаются только явным --type comment."""
+        records = [
+            json.loads(line) for line in
+            self.export('comments.jsonl', '--type', 'comment').splitlines()]
+        self.assertEqual(
+            [(record['type'], record['text']) for record in records],
+            [('comment', 'Ок')])
+
+    def test_csv_since(self):
+        """--since отсекает старые посты, CSV — один тип с заголовком."""
+        rows = list(csv.DictReader(StringIO(self.export(
+            'posts.csv', '--format', 'csv', '--type', 'post',
+            '--since', '2020-01-01'))))
+        self.assertEqual([row['text'] for row in rows], ['Новый пост'])
+        self.assertEqual(rows[0]['author'], 'author')
+        with self.assertRaises(CommandError):
+            self.export('mixed.csv', '--format', 'csv')
+
+    def test_endpoint_is_staff_only_and_streams(self):
+        url = reverse('posts:export_posts')
+        client = Client()
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(self.reader)
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(User.objects.create_user(
+            username='staff', is_staff=True))
+        response = client.get(url, {'type': 'comment', 'gzip': '1'})
+        self.assertTrue(response.streaming)
+        records = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(
+            [json.loads(line)['text'] for line in records.splitlines()],
+            ['Ок'])
+        response = client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import search
+from ..models import AuthorCounters, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+def jsonl(*records):
+    return StringIO(''.join(json.dumps(record) + '\n' for record in records))
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.dir = tempfile.mkdtemp(dir='.')
+        self.addCleanup(os.rmdir, self.dir)
+
+    def run_import(self, *args, **options):
+        out = StringIO()
+        call_command('import_posts', *args, stdout=out, stderr=StringIO(),
+                     **options)
+        return out.getvalue()
+
+    def test_jsonl_keeps_derived_data_consistent(self):
+        """Импорт из stdin: даты сохраняются, ленты, счётчики и поиск —
+        как при создании через ORM."""
+        self.run_import(stdin=jsonl(
+            {'type': 'group', 'slug': 'books', 'title': 'Книги'},
+            {'type': 'follow', 'user': 'reader', 'author': 'author'},
+            {'type': 'post', 'author': 'author', 'group': 'books',
+             'text': 'Старые книги', 'pub_date': '2015-03-01T10:00:00'},
+            {'type': 'post', 'author': 'nobody', 'text': 'Пропуск'},
+            {'type': 'post', 'author': 'author', 'text': 'Свежая запись'},
+        ), chunk_size=2, batch_size=1)
+        old = Post.objects.get(text='Старые книги')
+        self.assertEqual(old.group, Group.objects.get(slug='books'))
+        self.assertEqual(old.pub_date.year, 2015)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            AuthorCounters.objects.get(user=self.author).posts_count, 2)
+        self.assertEqual(
+            AuthorCounters.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(search.post_ids('книга'), [old.pk])
+
+    def test_csv_file_creates_missing_authors(self):
+        """CSV с --type и --create-missing создаёт неизвестных авторов."""
+        path = os.path.join(self.dir, 'posts.csv')
+        self.addCleanup(os.remove, path)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('author,text\nnewbie,"Первый, с запятой"\n')
+        self.run_import(path, type='post', create_missing=True)
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newbie')
+        self.assertEqual(post.text, 'Первый, с запятой')
+        self.assertFalse(post.author.has_usable_password())
+
+    def test_resume_from_checkpoint(self):
+        """После сбоя загрузка продолжается с последней транзакции."""
+        checkpoint = os.path.join(self.dir, 'checkpoint')
+        self.addCleanup(os.remove, checkpoint)
+        lines = [
+            json.dumps({'type': 'post', 'author': 'author', 'text': str(i)})
+            for i in range(5)
+        ]
+        broken = StringIO('\n'.join(lines[:3] + ['{oops'] + lines[4:]))
+        with self.assertRaises(CommandError):
+            self.run_import(stdin=broken, chunk_size=2,
+                            checkpoint=checkpoint)
+        with open(checkpoint) as file:
+            self.assertEqual(file.read(), '2')
+        self.assertEqual(Post.objects.count(), 2)
+        self.run_import(stdin=StringIO('\n'.join(lines)), chunk_size=2,
+                        checkpoint=checkpoint)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['0', '1', '2', '3', '4'])
+
+    def test_stats_count_written_rows(self):
+        """Уже существующие группы и подписки не считаются загруженными."""
+        records = (
+            {'type': 'group', 'slug': 'books'},
+            {'type': 'group', 'slug': 'books'},
+            {'type': 'follow', 'user': 'reader', 'author': 'author'},
+        )
+        self.assertIn('групп 1, постов 0, подписок 1',
+                      self.run_import(stdin=jsonl(*records)))
+        self.assertIn('групп 0, постов 0, подписок 0',
+                      self.run_import(stdin=jsonl(*records)))
+
+    def test_non_object_records_rejected(self):
+        """Запись, которая не объект JSON, — ошибка с номером строки."""
+        errors = StringIO()
+        call_command('import_posts', stdout=StringIO(), stderr=errors,
+                     stdin=jsonl(
+                         ['post'], 'post',
+                         {'type': 'post', 'author': 'author', 'text': 'Пост'}))
+        self.assertEqual(errors.getvalue().splitlines(), [
+            '0: запись — не объект, а list',
+            '1: запись — не объект, а str',
+        ])
+        self.assertEqual(Post.objects.get().text, 'Пост')
+
+    def test_pub_dates_match_their_posts(self):
+        """Даты из файла попадают в свои посты, поле модели не меняется."""
+        self.run_import(stdin=jsonl(
+            {'type': 'post', 'author': 'author', 'text': 'Первый',
+             'pub_date': '2011-01-01T10:00:00'},
+            {'type': 'post', 'author': 'author', 'text': 'Второй'},
+            {'type': 'post', 'author': 'author', 'text': 'Третий',
+             'pub_date': '2013-01-01T10:00:00'},
+        ))
+        years = dict(Post.objects.values_list('text', 'pub_date__year'))
+        self.assertEqual(years['Первый'], 2011)
+        self.assertEqual(years['Третий'], 2013)
+        self.assertGreater(years['Второй'], 2020)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedIndexesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        Comment.objects.create(
+            text='Комментарий', author=cls.reader, post=cls.post)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора отвергается базой."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_views_use_indexes(self):
+        """Запросы страниц не делают полных проходов и сортировок."""
+        out = StringIO()
+        call_command('explain_views', '--fail', stdout=out)
+        self.assertIn('Полных проходов и сортировок не найдено',
+                      out.getvalue())
+
+    def test_explain_bypasses_caches(self):
+        """Повторный запуск видит те же запросы, а не ответы из кеша."""
+        runs = []
+        for _ in range(2):
+            out = StringIO()
+            call_command('explain_views', stdout=out)
+            runs.append([
+                line for line in out.getvalue().splitlines()
+                if 'запросов' in line])
+        self.assertEqual(runs[0], runs[1])
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, timing
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.values.clear()
+        self.client = Client()
+
+    def scrape(self):
+        response = self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_histograms_per_view(self):
+        """Гистограммы по имени view, корзины накоплены."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        lines = self.scrape()
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2', lines)
+        self.assertIn(
+            'yatube_requests_total'
+            '{method="GET",status="200",view="posts:index"} 2', lines)
+        self.assertIn(
+            'yatube_request_queries_count{view="posts:index"} 2', lines)
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in lines
+            if line.startswith('yatube_request_queries_bucket')
+            and 'posts:index' in line
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        ratio = [line for line in lines
+                 if line.startswith('yatube_cache_hit_ratio ')]
+        self.assertGreater(float(ratio[0].split()[1]), 0)
+
+    def test_aggregates_worker_files(self):
+        """С METRICS_DIR складываются снимки всех процессов."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory)
+        key = json.dumps(['yatube_requests_total', sorted({
+            'method': 'GET', 'status': '200', 'view': 'posts:index'}.items())])
+        with open(os.path.join(directory, '1.json'), 'w') as file:
+            json.dump({key: 5}, file)
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('posts:index'))
+            lines = self.scrape()
+        self.assertIn(
+            'yatube_requests_total'
+            '{method="GET",status="200",view="posts:index"} 6', lines)
+
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_without_token_only_staff(self):
+        """Без токена метрики не публичны."""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with override_settings(DEBUG=True):
+            self.assertEqual(Client().get('/metrics').status_code, 200)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_not_measured(self):
+        """Вне выборки Server-Timing запрос только считается и засекается,
+        без перехвата SQL и кеша."""
+        with mock.patch.object(timing, 'measure',
+                               side_effect=AssertionError('measured')):
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        lines = self.scrape()
+        self.assertIn(
+            'yatube_requests_total'
+            '{method="GET",status="200",view="posts:index"} 1', lines)
+        self.assertFalse([line for line in lines if line.startswith(
+            'yatube_request_queries_count{')])
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginators import CursorPaginator, EstimatedCountPaginator
+
+User = get_user_model()
+
+
+@override_settings(CURSOR_PAGINATOR=True)
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание группы',
+        )
+        for i in range(25):
+            Post.objects.create(
+                text=f'Пост №{i}',
+                author=cls.user,
+                group=cls.group,
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_pages_walk_forward_and_back(self):
+        """Курсоры ведут по страницам без пропусков и повторов."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        seen = []
+        response = self.guest_client.get(url)
+        pages = [response.context['page_obj']]
+        while pages[-1].has_next():
+            response = self.guest_client.get(
+                url, {'after': pages[-1].next_cursor})
+            pages.append(response.context['page_obj'])
+        for page in pages:
+            seen.extend(post.id for post in page)
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(len(pages[-1]), 25 % settings.FOR_PAGINATOR)
+
+        response = self.guest_client.get(
+            url, {'before': pages[-1].previous_cursor})
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), list(pages[1]))
+
+    def test_cursor_page_skips_count(self):
+        """Курсорная страница не выполняет COUNT(*) и OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_page(after=first.next_cursor)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'after': 'garbage'})
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 1)
+        self.assertFalse(page.has_previous())
+
+
+class PageWindowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание группы',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост №{i}', author=cls.user, group=cls.group)
+            for i in range(100))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_range_is_windowed(self):
+        """В навигации только окно номеров вокруг текущей страницы."""
+        response = Client().get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            {'page': 5})
+        window = settings.PAGINATOR_WINDOW
+        self.assertEqual(
+            list(response.context['page_range']),
+            list(range(5 - window, 5 + window + 1)))
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.posts = [
+            Post.objects.create(text=f'Пост №{i}', author=cls.user)
+            for i in range(5)
+        ]
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_unfiltered_list_uses_estimate(self):
+        """Без фильтров число строк оценивается без COUNT(*)."""
+        Post.objects.filter(pk=self.posts[0].pk).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, self.posts[-1].pk)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_filtered_list_counts_exactly(self):
+        """Отфильтрованный список считается точно."""
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(pk__lte=self.posts[1].pk), 2)
+        self.assertEqual(paginator.count, 2)
+
+    def test_small_table_counts_exactly(self):
+        """Небольшие таблицы считаются точно."""
+        Post.objects.filter(pk=self.posts[0].pk).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 4)
@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import RequestProfile
+from core.profiling import make_token
+
+from ..models import Follow, Post
+
+User = get_user_model()
+TEMP_PROFILER_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(PROFILER_DIR=TEMP_PROFILER_DIR)
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_superuser(
+            username='staff', email='staff@example.com', password='staff')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.staff)
+        Post.objects.create(text='Пост', author=cls.staff)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_PROFILER_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_signed_header_profiles_request(self):
+        """Чужой пользователь, токен сотрудника: профиль в админке."""
+        response = self.client.get(
+            reverse('posts:follow_index'),
+            HTTP_X_PROFILE=make_token('staff'))
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.view_name, 'posts:follow_index')
+        self.assertEqual(profile.username, 'staff')
+        self.assertGreater(profile.sql_count, 0)
+        self.assertIn('follow_index', profile.report)
+        sites = [query['site'] for query in json.loads(profile.queries)]
+        self.assertTrue(any('posts/views.py' in site for site in sites))
+        self.assertEqual(
+            json.loads(profile.templates)[0]['name'], 'posts/follow.html')
+        path = os.path.join(TEMP_PROFILER_DIR, profile.stats_file)
+        self.assertTrue(os.path.exists(path))
+
+        admin = Client()
+        admin.force_login(self.staff)
+        page = admin.get(reverse(
+            'admin:core_requestprofile_change', args=(profile.pk,)))
+        self.assertContains(page, 'posts/follow.html')
+        download = admin.get(reverse(
+            'admin:core_requestprofile_download', args=(profile.pk,)))
+        self.assertEqual(download.status_code, 200)
+        profile.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_token_not_saved_with_path(self):
+        """Токен из ?_profile= не попадает в сохранённый путь."""
+        token = make_token('staff')
+        response = self.client.get(
+            reverse('posts:follow_index'), {'_profile': token, 'page': 2})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(
+            profile.path, reverse('posts:follow_index') + '?page=2')
+        self.assertNotIn(token, profile.report)
+        profile.delete()
+
+    def test_invalid_tokens_are_ignored(self):
+        for token in ('garbage', make_token('reader')):
+            with self.subTest(token=token), self.assertLogs(
+                    'core.profiling', 'WARNING'):
+                response = self.client.get(
+                    reverse('posts:index'), {'_profile': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
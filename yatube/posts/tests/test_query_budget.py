@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_budget import QueryBudget, QueryBudgetExceeded
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Суммарное время SQL на страницу с запасом на медленные машины CI.
+MAX_SQL_TIME = 0.5
+
+
+def seed(users=20, groups=4, posts=120, comments=40, follows=10):
+    """Наполнить базу объёмами, на которых проявляются запросы 1+N."""
+    authors = [
+        User.objects.create_user(
+            username=f'user_{i}', first_name='Имя', last_name=f'№{i}')
+        for i in range(users)
+    ]
+    all_groups = [
+        Group.objects.create(
+            title=f'Группа {i}', slug=f'group-{i}', description='-')
+        for i in range(groups)
+    ]
+    all_posts = [
+        Post.objects.create(
+            text=f'Пост №{i}',
+            author=authors[i % users],
+            group=all_groups[i % groups] if i % 3 else None,
+        )
+        for i in range(posts)
+    ]
+    for i in range(comments):
+        Comment.objects.create(
+            text=f'Комментарий №{i}',
+            author=authors[i % users],
+            post=all_posts[-1],
+        )
+    for author in authors[1:follows + 1]:
+        Follow.objects.create(user=authors[0], author=author)
+    return authors, all_groups, all_posts
+
+
+class QueryBudgetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors, cls.groups, cls.posts = seed()
+        cls.reader = cls.authors[0]
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def assertWithinBudget(self, client, url, max_queries):
+        cache.clear()
+        with QueryBudget(max_queries, max_time=MAX_SQL_TIME, label=url):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_site_pages_budget(self):
+        """Страницы сайта укладываются в бюджет запросов."""
+        # Лента, группа, профиль и пост платят один-три индексных запроса
+        # за ETag (posts.conditional).
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:group_list',
+                    kwargs={'slug': self.groups[1].slug}): 7,
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[1].username}): 9,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.posts[-1].pk}): 7,
+            reverse('posts:follow_index'): 5,
+        }
+        for url, max_queries in budgets.items():
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.client, url, max_queries)
+
+    def test_admin_changelists_budget(self):
+        """Списки в админке укладываются в бюджет запросов."""
+        budgets = {
+            reverse('admin:posts_post_changelist'): 10,
+            reverse('admin:posts_group_changelist'): 5,
+            reverse('admin:posts_comment_changelist'): 10,
+            reverse('admin:posts_follow_changelist'): 5,
+        }
+        for url, max_queries in budgets.items():
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.admin_client, url, max_queries)
+
+    def test_report_groups_queries_by_call_site(self):
+        """Отчёт о превышении группирует запросы по месту вызова."""
+        budget = QueryBudget(1, label='1+N')
+        with self.assertRaises(QueryBudgetExceeded) as error:
+            with budget:
+                for post in Post.objects.all()[:3]:
+                    post.author.username
+        report = str(error.exception)
+        self.assertIn('1+N', report)
+        self.assertIn('3 × posts/tests/test_query_budget.py', report)
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from core.query_cache import cached, read_tables
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class QueryCacheTests(TransactionTestCase):
+    """В TestCase всё идёт в транзакции с записями, и кеш не заполняется;
+    здесь транзакции настоящие."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def test_repeated_query_served_from_cache(self):
+        Group.objects.cached().get(slug='group')
+        with self.assertNumQueries(0):
+            group = Group.objects.cached().get(slug='group')
+        self.assertEqual(group, self.group)
+        with self.assertNumQueries(1):
+            Group.objects.get(slug='group')
+
+    def test_save_invalidates(self):
+        self.assertEqual(Group.objects.cached().get(pk=self.group.pk).title,
+                         'Группа')
+        self.group.title = 'Новое название'
+        self.group.save()
+        with self.assertNumQueries(1):
+            group = Group.objects.cached().get(pk=self.group.pk)
+        self.assertEqual(group.title, 'Новое название')
+
+    def test_bulk_operations_invalidate(self):
+        posts = Post.objects.cached().filter(author=self.author)
+        self.assertEqual(posts.count(), 0)
+        Post.objects.bulk_create(
+            [Post(text='Пост %d' % i, author=self.author) for i in range(3)])
+        self.assertEqual(posts.count(), 3)
+        Post.objects.filter(author=self.author).update(text='Правка')
+        self.assertEqual(
+            set(posts.values_list('text', flat=True)), {'Правка'})
+        Post.objects.all().delete()
+        self.assertFalse(posts.exists())
+
+    def test_write_to_joined_table_invalidates(self):
+        Post.objects.create(text='Пост', author=self.author)
+        feed = Post.objects.for_feed().cached()
+        self.assertEqual(feed[0].author.username, 'author')
+        User.objects.filter(pk=self.author.pk).update(username='renamed')
+        self.assertEqual(feed[0].author.username, 'renamed')
+
+    def test_foreign_manager_and_exists(self):
+        reader = User.objects.create_user(username='reader')
+        users = cached(User.objects.all())
+        self.assertEqual(users.get(username='reader'), reader)
+        with self.assertNumQueries(0):
+            users.get(username='reader')
+        following = Follow.objects.cached().filter(
+            user=reader, author=self.author)
+        self.assertFalse(following.exists())
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertTrue(following.exists())
+
+    def test_rolled_back_reads_not_cached(self):
+        """Прочитанное после записи в транзакции может откатиться."""
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                Group.objects.create(
+                    title='Призрак', slug='ghost', description='')
+                self.assertTrue(
+                    Group.objects.cached().filter(slug='ghost').exists())
+                1 / 0
+        self.assertFalse(Group.objects.cached().filter(slug='ghost').exists())
+
+    @override_settings(QUERY_CACHE_ENABLED=False)
+    def test_disabled(self):
+        Group.objects.cached().get(slug='group')
+        with self.assertNumQueries(1):
+            Group.objects.cached().get(slug='group')
+
+    def test_read_tables(self):
+        sql = str(Post.objects.for_feed().filter(group=self.group).query)
+        self.assertEqual(read_tables(sql),
+                         ['auth_user', 'posts_group', 'posts_post'])
+        self.assertEqual(
+            read_tables('SELECT 1 FROM "django_session"'), [])
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class StemTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к общей основе."""
+        cases = (
+            ('книга', 'книги', 'книгами', 'книгой'),
+            ('красивый', 'красивая', 'красивейший'),
+            ('читать', 'читали', 'читающий'),
+            ('Ёлка', 'елки'),
+        )
+        for forms in cases:
+            with self.subTest(forms=forms):
+                self.assertEqual(len({search.stem(word) for word in forms}), 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.book = Post.objects.create(
+            text='Прочитал интересную книгу о путешествиях',
+            author=cls.user,
+        )
+        cls.books = Post.objects.create(
+            text='Книги, книги и ещё раз книги',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(
+            text='Сегодня хорошая погода',
+            author=cls.user,
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_search_is_ranked_and_stemmed(self):
+        """Поиск находит другие формы слова, лучшие совпадения первыми."""
+        self.assertEqual(self.found('книгами'), [self.books, self.book])
+        self.assertEqual(self.found('путешествие книга'), [self.book])
+        self.assertEqual(self.found('самолёт'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Погода для чтения книг'
+        self.other.save()
+        self.assertIn(self.other, self.found('книга'))
+        self.assertEqual(self.found('сегодня'), [])
+        self.other.delete()
+        self.assertEqual(self.found('погода'), [])
+
+    def test_pagination_keeps_query(self):
+        """Ссылки паджинатора сохраняют строку поиска."""
+        Post.objects.bulk_create(
+            Post(text=f'Книга №{i}', author=self.user)
+            for i in range(settings.FOR_PAGINATOR))
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': 'книга'})
+        self.assertEqual(response.context['paginator'].count,
+                         settings.FOR_PAGINATOR + 2)
+        self.assertContains(response, '?q=%D0%BA%D0%BD%D0%B8%D0%B3%D0%B0'
+                                      '&amp;page=2')
+        self.assertEqual(len(self.found('книга', page=2)), 2)
+
+    def test_search_api(self):
+        """API поиска отдаёт JSON с найденными постами."""
+        response = self.client.get(
+            reverse('posts:post_search_api'), {'q': 'путешествия'})
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.book.pk)
+        self.assertEqual(data['results'][0]['author'], self.user.username)
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import SlowQuery
+from core.query_cache import track_writes
+from core.slow_queries import record_slow
+
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_wrapper_installed_on_connection(self):
+        # Снаружи только учёт записей кеша запросов: смена версий таблиц
+        # не должна попадать в замер.
+        self.assertEqual(connection.execute_wrappers[:2],
+                         [track_writes, record_slow])
+
+    def test_slow_query_logged_with_site_and_plan(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:follow_index'))
+        self.assertTrue(any('posts/views.py' in line for line in logs.output))
+        recorded = SlowQuery.objects.filter(
+            site__contains='posts/views.py', sql__startswith='SELECT')
+        self.assertTrue(recorded.exists())
+        for query in recorded:
+            self.assertTrue(query.plan)
+            self.assertNotIn('EXPLAIN не выполнен', query.plan)
+            self.assertEqual(len(query.fingerprint), 32)
+
+    def test_writes_are_recorded_without_plan(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), \
+                self.assertLogs('core.slow_queries', 'WARNING'):
+            Post.objects.create(text='Ещё пост', author=self.author)
+        # В TestCase всё идёт в транзакции: запись ждёт конца запроса.
+        request_finished.send(sender=self.__class__)
+        insert = SlowQuery.objects.get(sql__startswith='INSERT INTO "posts')
+        self.assertEqual(insert.plan, '')
+        self.assertIn("'Ещё пост'", insert.params)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled_threshold_records_nothing(self):
+        self.client.get(reverse('posts:follow_index'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60 * 1000)
+    def test_fast_queries_are_not_recorded(self):
+        self.client.get(reverse('posts:follow_index'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_rolled_back_queries_are_recorded(self):
+        """Откат транзакции запроса не уносит запись о медленном запросе."""
+        with self.assertLogs('core.slow_queries', 'WARNING'), \
+                self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                Post.objects.create(text='Откат', author=self.author)
+                1 / 0
+        self.assertFalse(SlowQuery.objects.exists())
+        request_finished.send(sender=self.__class__)
+        self.assertTrue(SlowQuery.objects.filter(
+            sql__startswith='INSERT INTO "posts', params__contains='Откат',
+        ).exists())
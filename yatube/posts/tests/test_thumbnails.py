@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def thumbnail(self, post):
+        return thumbnails.thumbnail_file(post.image, '960x339')
+
+    def test_thumbnail_generated_on_upload(self):
+        """Миниатюра готова сразу после сохранения поста с картинкой."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('first.gif'))
+        thumbnail = self.thumbnail(post)
+        self.assertIsNotNone(default.kvstore.get(thumbnail))
+        self.assertTrue(thumbnail.exists())
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+
+    def test_template_never_generates_thumbnails(self):
+        """Без готовой миниатюры страница отдаёт исходную картинку и не
+        строит миниатюру при рендеринге."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('missing.gif'))
+        thumbnails.cleanup(post.image.name)
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            response = Client().get(reverse('posts:index'))
+        generate.assert_not_called()
+        self.assertContains(response, post.image.url)
+
+    def test_old_thumbnails_removed_on_replace(self):
+        """При замене картинки старые миниатюры удаляются."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('old.gif'))
+        old_thumbnail = self.thumbnail(post)
+        post.image = upload('new.gif')
+        post.save()
+        self.assertFalse(old_thumbnail.exists())
+        self.assertIsNone(default.kvstore.get(old_thumbnail))
+        self.assertTrue(self.thumbnail(post).exists())
+
+    def test_page_thumbnails_fetched_in_one_round_trip(self):
+        """Миниатюры всей страницы читаются одним get_many к кешу."""
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост №{i}', author=self.user,
+                image=upload(f'page{i}.gif'))
+        kvstore = default.kvstore
+        kv_cache = kvstore.cache
+        kv_cache.clear()
+        get = mock.patch.object(kvstore, 'get', wraps=kvstore.get)
+        get_many = mock.patch.object(
+            kv_cache, 'get_many', wraps=kv_cache.get_many)
+        with get as get, get_many as get_many:
+            response = Client().get(reverse('posts:index'))
+        self.assertEqual(get.call_count, 0)
+        thumbnail_keys = [
+            call[0][0] for call in get_many.call_args_list
+            if 'sorl-thumbnail' in str(call[0][0])
+        ]
+        self.assertEqual(len(thumbnail_keys), 1)
+        self.assertEqual(len(thumbnail_keys[0]), 3)
+        for post in Post.objects.all():
+            self.assertContains(response, self.thumbnail(post).url)
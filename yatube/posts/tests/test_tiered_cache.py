@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import SimpleTestCase
+
+from core.tiered_cache import GENERATION_KEY, TieredCache
+
+
+def worker(name, **options):
+    """Экземпляр кеша со своим L1, как в отдельном процессе."""
+    options = {'L2': 'shared', 'L1_BYPASS': ('version:',), **options}
+    cache = TieredCache('test-%s' % name, {'OPTIONS': options})
+    cache.local.clear()
+    cache.local.checked = 0.0
+    # Первое чтение сверяет поколение и сбрасывает L1 нового процесса.
+    cache.get('warm-up')
+    return cache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.first = worker('first')
+        self.second = worker('second')
+
+    def test_read_fills_l1_from_shared_l2(self):
+        self.first.set('page', 'html')
+        self.assertEqual(self.second.get('page'), 'html')
+        self.shared.delete('page')
+        self.assertEqual(self.second.get('page'), 'html')
+        self.assertEqual(self.first.get_many(['page', 'other']),
+                         {'page': 'html'})
+
+    def test_version_keys_bypass_l1(self):
+        self.first.set('version:index', 1, None)
+        self.assertEqual(self.second.get('version:index'), 1)
+        self.first.incr('version:index')
+        self.assertEqual(self.second.get('version:index'), 2)
+        self.assertEqual(self.second.get_many(['version:index']),
+                         {'version:index': 2})
+
+    def test_clear_in_other_process_drops_l1(self):
+        self.first.set('page', 'old')
+        self.assertEqual(self.second.get('page'), 'old')
+        self.first.clear()
+        self.second.local.checked = 0.0
+        self.assertIsNone(self.second.get('page'))
+
+    def test_delete_and_failed_add_drop_l1_entry(self):
+        self.first.set('key', 'old')
+        self.second.set('key', 'new')
+        self.assertFalse(self.first.add('key', 'other'))
+        self.assertEqual(self.first.get('key'), 'new')
+        self.second.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_l1_returns_copies(self):
+        self.first.set('list', [1])
+        self.first.get('list').append(2)
+        self.assertEqual(self.first.get('list'), [1])
+
+    def test_l1_is_bounded_lru(self):
+        cache = worker('small', L1_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.shared.delete_many(['a', 'b', 'c'])
+        self.assertEqual(cache.get_many(['a', 'b', 'c']),
+                         {'b': 'b', 'c': 'c'})
+
+    def test_l1_respects_shorter_timeout(self):
+        self.first.set('short', 'value', 0)
+        self.assertIsNone(self.first.get('short'))
+
+    def test_generation_is_created_on_first_read(self):
+        self.assertIsNotNone(self.shared.get(GENERATION_KEY))
+
+    def test_add_is_atomic_across_workers(self):
+        """Из одновременных add с одним ключом успешен ровно один."""
+        workers = [worker('add-%d' % i) for i in range(8)]
+        start = threading.Barrier(len(workers))
+        added = []
+
+        def run(cache):
+            start.wait()
+            added.append(cache.add('lock', True, 60))
+
+        has_key = FileBasedCache.has_key
+
+        def slow_has_key(*args, **kwargs):
+            # Расширяет окно между проверкой и записью в add().
+            found = has_key(*args, **kwargs)
+            time.sleep(0.01)
+            return found
+
+        with mock.patch.object(FileBasedCache, 'has_key', slow_has_key):
+            threads = [threading.Thread(target=run, args=(cache,))
+                       for cache in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(added.count(True), 1)
+
+    def test_incr_is_atomic_across_workers(self):
+        """Одновременные incr версии не теряют приращений."""
+        workers = [worker('incr-%d' % i) for i in range(8)]
+        self.first.set('version:scope', 0, None)
+        start = threading.Barrier(len(workers))
+
+        def run(cache):
+            start.wait()
+            for _ in range(5):
+                cache.incr('version:scope')
+
+        get = FileBasedCache.get
+
+        def slow_get(*args, **kwargs):
+            # Расширяет окно между чтением и записью в incr().
+            value = get(*args, **kwargs)
+            time.sleep(0.001)
+            return value
+
+        with mock.patch.object(FileBasedCache, 'get', slow_get):
+            threads = [threading.Thread(target=run, args=(cache,))
+                       for cache in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.shared.get('version:scope'), 40)
+
+    def test_tests_use_own_l2(self):
+        """Тесты не трогают кеш dev-сервера в общем временном каталоге."""
+        self.assertNotEqual(
+            self.shared._dir,
+            os.path.join(tempfile.gettempdir(), 'yatube-cache'))
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def entries(self):
+        return TimelineEntry.objects.filter(user=self.follower)
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка заполняет ленту, новый пост раскладывается в неё."""
+        self.follower_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(
+            list(self.entries().values_list('post', flat=True)),
+            [self.old_post.pk])
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author.username}))
+        self.assertFalse(self.entries().exists())
+
+    @override_settings(TIMELINE_SIZE=3)
+    def test_timeline_is_capped(self):
+        """В ленте хранится не больше TIMELINE_SIZE самых свежих постов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост №{i}', author=self.author)
+            for i in range(5)
+        ]
+        self.assertEqual(
+            list(self.entries().values_list('post', flat=True)),
+            [post.pk for post in reversed(posts[-3:])])
+
+    @override_settings(TIMELINE_SIZE=2)
+    def test_trim_keeps_entries_tied_at_cutoff(self):
+        """Записи с одинаковой датой режутся по id, а не все разом."""
+        pub_date = timezone.now()
+        posts = [
+            Post.objects.create(text=f'Пост №{i}', author=self.author)
+            for i in range(3)
+        ]
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user=self.follower, post=post, pub_date=pub_date)
+            for post in posts
+        ])
+        timeline.trim(self.follower.pk)
+        self.assertEqual(
+            set(self.entries().values_list('post', flat=True)),
+            {posts[1].pk, posts[2].pk})
+
+    def test_fan_out_does_not_trim_short_timelines(self):
+        """Пока лента не переполнена, на подписчика не тратится запросов."""
+        followers = [
+            User.objects.create_user(username=f'follower{i}')
+            for i in range(5)
+        ]
+        Follow.objects.bulk_create([
+            Follow(user=follower, author=self.author)
+            for follower in followers
+        ])
+        # Пост, подписчики, вставка и одна проверка длины лент.
+        with self.assertNumQueries(4):
+            timeline.fan_out(self.old_post.pk)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=self.old_post).count(), 5)
+
+    @override_settings(TIMELINE_MAX_FOLLOWING=0)
+    def test_heavy_follower_falls_back_to_query(self):
+        """Для подписанных на многих авторов лента строится запросом."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.old_post])
+
+    @override_settings(TIMELINE_MAX_FOLLOWING=1)
+    def test_heavy_followers_get_no_entries(self):
+        """Посты не раскладываются тем, кто читает ленту запросом."""
+        other = User.objects.create_user(username='other')
+        light = User.objects.create_user(username='light')
+        Follow.objects.create(user=self.follower, author=other)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=light, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(self.entries().filter(post=post).exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=light, post=post).exists())
+        TimelineEntry.objects.filter(post=post).delete()
+        timeline.fan_out_many(Post.objects.filter(pk=post.pk))
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(post=post)
+                 .values_list('user', flat=True)), [light.pk])
+
+    @override_settings(TIMELINE_MAX_FOLLOWING=1)
+    def test_unfollow_under_limit_rebuilds_timeline(self):
+        """Вернувшийся к ленте подписчик видит посты, вышедшие без неё."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(self.entries().filter(post=post).exists())
+        Follow.objects.get(user=self.follower, author=other).delete()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
@@ -0,0 +1,62 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_header_and_log_fields(self):
+        """Заголовок и лог сходятся с настоящим числом запросов."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertLogs('core.timing', 'INFO') as logs:
+                response = self.client.get(url)
+        header = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', header)
+        self.assertRegex(header, r'template;dur=[\d.]+')
+        self.assertRegex(header, r'total;dur=[\d.]+$')
+        record = logs.records[0]
+        self.assertEqual(record.view, 'posts:profile')
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.sql_count, len(queries))
+        self.assertGreater(record.template_ms, 0)
+
+    def test_cache_hits_and_misses(self):
+        """Второй заход на главную попадает в кеш страницы: рисуются
+        только дырки для зрителя, запросов к ленте нет."""
+        url = reverse('posts:index')
+        first = self.client.get(url)['Server-Timing']
+        second = self.client.get(url)['Server-Timing']
+        misses = [
+            int(re.search(r'(\d+) misses', header).group(1))
+            for header in (first, second)
+        ]
+        queries = [
+            int(re.search(r'(\d+) queries', header).group(1))
+            for header in (first, second)
+        ]
+        self.assertLess(misses[1], misses[0])
+        self.assertLess(queries[1], queries[0])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
@@ -6,10 +6,12 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -121,14 +123,63 @@ class PostPagesTests(TestCase):
             author=self.user)
         content_add = self.authorized_client.get(
             reverse('posts:index')).content
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
+        content_update = self.authorized_client.get(
+            reverse('posts:index')).content
+        self.assertEqual(content_add, content_update)
         post.delete()
         content_delete = self.authorized_client.get(
             reverse('posts:index')).content
-        self.assertEqual(content_add, content_delete)
-        cache.clear()
-        content_cache_clear = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(content_add, content_cache_clear)
+        self.assertNotEqual(content_add, content_delete)
+
+    def test_cache_index_page_invalidated_by_group(self):
+        """Изменение группы сбрасывает кеш главной."""
+        self.authorized_client.get(reverse('posts:index'))
+        cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn('page_obj', cached.context)
+        self.group.save()
+        rebuilt = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('page_obj', rebuilt.context)
+
+    def test_post_card_fragment_cache(self):
+        """Карточка поста кешируется до правки поста."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        guest_client = Client()
+        self.assertContains(guest_client.get(url), self.post.text)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertContains(guest_client.get(url), self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        self.assertContains(guest_client.get(url), post.text)
+        post.text = self.post.text
+        post.save()
+
+    def test_post_card_follows_group_and_author(self):
+        """Карточка обновляется при смене адреса группы, её удалении и
+        переименовании автора."""
+        url = reverse('posts:index')
+        guest_client = Client()
+        self.assertContains(guest_client.get(url), '/group/test-slug/')
+        group = Group.objects.create(
+            title='Другая группа', slug='old-slug', description='')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        self.assertContains(guest_client.get(url), '/group/old-slug/')
+        group.slug = 'new-slug'
+        group.save()
+        response = guest_client.get(url)
+        self.assertContains(response, '/group/new-slug/')
+        self.assertNotContains(response, '/group/old-slug/')
+        group.delete()
+        self.assertNotContains(guest_client.get(url), '/group/new-slug/')
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        Post.objects.filter(pk=self.post.pk).update(group=self.group)
+        self.group.save()
+        guest_client.get(group_url)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        self.assertContains(guest_client.get(url), 'Переименованный')
+        self.assertContains(guest_client.get(group_url), 'Переименованный')
 
 
 class PaginatorViewsTest(TestCase):
@@ -172,6 +223,7 @@ class PaginatorViewsTest(TestCase):
                 )
 
 
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -238,3 +290,59 @@ class FollowViewsTest(TestCase):
         response = self.author_client.get(
             reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+class QueryCountViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_posts(self):
+        """Число запросов страницы не зависит от числа постов на ней."""
+        author = User.objects.create_user(username='author_0')
+        Follow.objects.create(user=self.user, author=author)
+        Post.objects.create(text='Нулевой', author=author)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        before = {url: self.count_queries(url) for url in urls}
+        for i in range(1, 6):
+            author = User.objects.create_user(username=f'author_{i}')
+            Follow.objects.create(user=self.user, author=author)
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'slug-{i}', description='-')
+            for text in ('Первый', 'Второй'):
+                Post.objects.create(
+                    text=text, author=author, group=group)
+                Post.objects.create(
+                    text=text, author=self.user, group=self.group)
+                Comment.objects.create(
+                    text=text, author=author, post=self.post)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
@@ -0,0 +1,135 @@
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics, timing
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_options(geometry):
+    return dict(settings.POST_THUMBNAILS[geometry])
+
+
+def thumbnail_file(image, geometry):
+    """Файл миниатюры, который построил бы sorl, без обращения к картинке.
+
+    Повторяет подготовку опций из ``ThumbnailBackend.get_thumbnail``,
+    чтобы имена совпадали с теми, что создаёт ``generate``.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = thumbnail_options(geometry)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def get_many(files):
+    """Найти в KV-хранилище sorl сразу несколько миниатюр.
+
+    Для стандартного cached_db-хранилища это один ``get_many`` к кешу и
+    не больше одного запроса к базе за промахами вместо пары обращений
+    на каждую картинку. Возвращает словарь имя файла -> ImageFile | None.
+    """
+    kvstore = default.kvstore
+    keys = {add_prefix(thumbnail.key): thumbnail for thumbnail in files}
+    if isinstance(kvstore, cached_db_kvstore.KVStore):
+        raw = kvstore.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in raw]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value'))
+            fetched = {
+                key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }
+            kvstore.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            raw.update(fetched)
+    else:
+        raw = {key: kvstore._get_raw(key) for key in keys}
+    result = {}
+    for key, thumbnail in keys.items():
+        value = raw.get(key)
+        result[thumbnail.name] = (
+            deserialize_image_file(value)
+            if value and value != cached_db_kvstore.EMPTY_VALUE
+            else None)
+    return result
+
+
+def prefetch(posts):
+    """Подготовить миниатюры для всех постов страницы одним обращением.
+
+    Каждому посту проставляется ``prefetched_thumbnails``: размер ->
+    (файл миниатюры, найденная миниатюра или None). Его читает тег
+    ``post_thumbnail``.
+    """
+    posts = list(posts)
+    files = []
+    for post in posts:
+        post.prefetched_thumbnails = {}
+        if not post.image:
+            continue
+        for geometry in settings.POST_THUMBNAILS:
+            thumbnail = thumbnail_file(post.image, geometry)
+            post.prefetched_thumbnails[geometry] = thumbnail
+            files.append(thumbnail)
+    found = get_many(files) if files else {}
+    for post in posts:
+        for geometry, thumbnail in post.prefetched_thumbnails.items():
+            post.prefetched_thumbnails[geometry] = (
+                thumbnail, found.get(thumbnail.name))
+    return posts
+
+
+def generate(post_id):
+    """Построить все миниатюры поста, которые используют шаблоны.
+
+    После генерации пост помечается изменённым, чтобы закешированные
+    карточки и страницы с исходной картинкой перестроились.
+    """
+    post = (
+        Post.objects.filter(pk=post_id)
+        .only('image', 'author', 'group').first()
+    )
+    if post is None or not post.image:
+        return
+    start = time.perf_counter()
+    with timing.span('thumbnails'):
+        for geometry in settings.POST_THUMBNAILS:
+            get_thumbnail(
+                post.image, geometry, **thumbnail_options(geometry))
+    metrics.registry.observe(
+        'yatube_thumbnail_generation_seconds', {},
+        time.perf_counter() - start)
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    cache.bump_after_commit(
+        cache.post_scope(post_id), *cache.post_scopes(post))
+
+
+def cleanup(image_name):
+    """Удалить миниатюры картинки и их записи в KV-хранилище sorl."""
+    if image_name:
+        delete(image_name, delete_file=False)
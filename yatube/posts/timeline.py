@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import AuthorCounters, Follow, Post, TimelineEntry
+
+
+def _following(user_id):
+    """Число подписок по счётчику, без COUNT по Follow."""
+    return (
+        AuthorCounters.objects.filter(user_id=user_id)
+        .values_list('following_count', flat=True).first()
+    ) or 0
+
+
+def uses_timeline(user_id):
+    """Читает ли подписчик ленту из TimelineEntry (см. ``feed_for``).
+
+    Подписанным больше чем на TIMELINE_MAX_FOLLOWING авторов посты в
+    ленту не раскладываются: их лента — прямой запрос по Follow.
+    """
+    return _following(user_id) <= settings.TIMELINE_MAX_FOLLOWING
+
+
+def resume(user_id):
+    """Собрать ленту заново, если после отписки подписок стало ровно
+    TIMELINE_MAX_FOLLOWING: пока их было больше, посты в неё не
+    раскладывались."""
+    if _following(user_id) == settings.TIMELINE_MAX_FOLLOWING:
+        rebuild(user_id)
+
+
+def trim(user_id):
+    """Оставить в ленте подписчика не больше TIMELINE_SIZE записей.
+
+    Граница — по (pub_date, id): записи с той же датой, что и граничная,
+    но новее неё, остаются.
+    """
+    size = settings.TIMELINE_SIZE
+    cutoff = (
+        TimelineEntry.objects.filter(user_id=user_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id')[size:size + 1]
+    )
+    cutoff = list(cutoff)
+    if cutoff:
+        pub_date, entry_id = cutoff[0]
+        TimelineEntry.objects.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lte=entry_id),
+            user_id=user_id,
+        ).delete()
+
+
+def trim_overflowing(user_ids):
+    """Обрезать только те ленты из ``user_ids``, что длиннее TIMELINE_SIZE.
+
+    Длины лент считаются одним запросом на пачку подписчиков, так что
+    обычная вставка не стоит двух запросов на каждого.
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), settings.TIMELINE_BATCH_SIZE):
+        overflowing = (
+            TimelineEntry.objects
+            .filter(user_id__in=user_ids[
+                start:start + settings.TIMELINE_BATCH_SIZE])
+            .order_by().values('user_id').annotate(size=Count('id'))
+            .filter(size__gt=settings.TIMELINE_SIZE)
+            .values_list('user_id', flat=True)
+        )
+        for user_id in overflowing:
+            trim(user_id)
+
+
+def fan_out(post_id):
+    """Разложить новый пост по лентам подписчиков автора, которые читают
+    ленту (``uses_timeline``)."""
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    if post is None:
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .exclude(user__counters__following_count__gt=(
+            settings.TIMELINE_MAX_FOLLOWING))
+        .values_list('user_id', flat=True).distinct()
+        .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+    )
+    batch = []
+    for user_id in followers:
+        batch.append(user_id)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _push(post, batch)
+            batch = []
+    if batch:
+        _push(post, batch)
+
+
+def fan_out_many(posts):
+    """Разложить много постов сразу, например после bulk_create.
+
+    Пары (подписчик, пост) читаются одним запросом по Follow, пишутся
+    пакетами, а обрезаются в конце только переполненные ленты.
+    """
+    # Условия в одном filter(): все они об одной и той же подписке.
+    entries = (
+        posts.filter(
+            Q(author__following__user__counters__isnull=True)
+            | Q(author__following__user__counters__following_count__lte=(
+                settings.TIMELINE_MAX_FOLLOWING)),
+            author__following__isnull=False,
+        )
+        .values_list('author__following__user_id', 'pk', 'pub_date')
+        .iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+    )
+    user_ids = set()
+    batch = []
+    for user_id, post_id, pub_date in entries:
+        user_ids.add(user_id)
+        batch.append(TimelineEntry(
+            user_id=user_id, post_id=post_id, pub_date=pub_date))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    trim_overflowing(user_ids)
+
+
+def _push(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post.pk,
+                          pub_date=post.pub_date)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    trim_overflowing(user_ids)
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту подписчика последние посты нового автора."""
+    if not uses_timeline(user_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim_overflowing([user_id])
+
+
+def rebuild(user_id):
+    """Собрать ленту подписчика заново: последние посты всех его авторов.
+
+    Вставляет не больше TIMELINE_SIZE строк, сколько бы постов ни было у
+    авторов, поэтому годится для наполнения больших баз.
+    """
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = (
+        Post.objects.filter(author__following__user_id=user_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def feed_for(user):
+    """Посты авторов, на которых подписан ``user``, самые свежие первыми.
+
+    Лента читается из TimelineEntry по индексу (user, pub_date); для
+    подписанных на очень многих авторов (``uses_timeline``) остаётся
+    прямой запрос по Follow.
+    """
+    if not uses_timeline(user.pk):
+        return Post.objects.filter(author__following__user=user)
+    # Сортировка по дате из самой ленты, иначе индекс не избавит от
+    # сортировки всех постов подписчика.
+    return Post.objects.filter(timeline_entries__user=user).order_by(
+        '-timeline_entries__pub_date')
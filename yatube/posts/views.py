@@ -3,38 +3,108 @@ from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.core.paginator import Paginator
 from django.shortcuts import redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.http import (HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils.http import urlencode
 
+from core.query_cache import cached
+
+from . import counters, exporter, search, thumbnails, timeline
+from .cache import (cache_page_versioned, index_scope,
+                    prefetch_card_versions)
+from .conditional import (conditional_page, group_page_scopes,
+                          group_validators, index_validators,
+                          post_page_scopes, post_validators,
+                          profile_page_scopes, profile_validators)
 from .forms import CommentForm, PostForm
 from .models import Follow, Group
 from .models import Post
+from .paginators import CursorPaginator, page_window
 
 
 User = get_user_model()
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.FOR_PAGINATOR)
+def get_page_context(queryset, request, cursor=None, count=None):
+    if cursor is None:
+        cursor = settings.CURSOR_PAGINATOR
+    if not any(map(request.GET.get, ('page', 'after', 'before'))):
+        # Первые страницы лент читают чаще всего.
+        queryset = queryset.cached()
+    if cursor:
+        paginator = CursorPaginator(queryset, settings.FOR_PAGINATOR)
+        page_obj = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+        page_number = page_obj.number
+    else:
+        paginator = Paginator(queryset, settings.FOR_PAGINATOR)
+        if count is not None:
+            # Число уже известно из счётчиков: обходимся без COUNT(*).
+            paginator.count = count
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+    thumbnails.prefetch(page_obj)
+    prefetch_card_versions(page_obj)
+    return {
+        'paginator': paginator,
+        'page_number': page_number,
+        'page_obj': page_obj,
+        'page_range': page_window(page_obj, settings.PAGINATOR_WINDOW),
+    }
+
+
+def get_comments_page(post, request):
+    """Порция комментариев поста по курсору (created, id) вместе с авторами."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+def get_search_context(request):
+    query = request.GET.get('q', '').strip()
+    ids = search.post_ids(query) if query else []
+    paginator = Paginator(ids, settings.FOR_PAGINATOR)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    # Посты страницы в порядке релевантности; удалённые после поиска
+    # пропускаем.
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    prefetch_card_versions(page_obj.object_list)
     return {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&' if query else '',
         'paginator': paginator,
         'page_number': page_number,
         'page_obj': page_obj,
+        'page_range': page_window(page_obj, settings.PAGINATOR_WINDOW),
     }
 
 
-@cache_page(60 * 20)
+@conditional_page(index_validators)
+@cache_page_versioned(settings.INDEX_CACHE_TIMEOUT, [index_scope()])
 def index(request):
-    context = get_page_context(Post.objects.all(), request)
+    context = get_page_context(Post.objects.for_feed(), request)
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_validators)
+@cache_page_versioned(settings.PAGE_CACHE_TIMEOUT, group_page_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     context = {
         'group': group,
         'posts': posts,
@@ -43,37 +113,122 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_validators)
+@cache_page_versioned(settings.PAGE_CACHE_TIMEOUT, profile_page_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user_posts = author.posts.all()
-    posts_count = user_posts.count()
-    following = (request.user.is_authenticated and author != request.user
-                 and Follow.objects.filter(user=request.user,
-                                           author=author).exists())
+    author = get_object_or_404(cached(User.objects.all()), username=username)
+    user_posts = author.posts.for_feed()
+    author_counters = counters.for_user(author)
+    posts_count = author_counters.posts_count
     context = {
         'author': author,
         'user_posts': user_posts,
         'posts_count': posts_count,
-        'following': following,
+        'counters': author_counters,
     }
-    context.update(get_page_context(user_posts, request))
+    context.update(get_page_context(user_posts, request, count=posts_count))
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_validators)
+@cache_page_versioned(settings.PAGE_CACHE_TIMEOUT, post_page_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    comments = get_comments_page(post, request)
     template = 'posts/post_detail.html'
     context = {
         'post': post,
         'comments': comments,
-        'form': form,
+        'posts_count': counters.for_user(post.author).posts_count,
     }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    comments = get_comments_page(post, request)
+    if request.GET.get('format') != 'json':
+        return render(request, 'posts/includes/comments_page.html',
+                      {'post': post, 'comments': comments})
+    next_url = None
+    if comments.has_next():
+        next_url = '%s?%s' % (
+            reverse('posts:post_comments', args=(post.pk,)),
+            urlencode({'after': comments.next_cursor, 'format': 'json'}))
+    return JsonResponse({
+        'results': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in comments
+        ],
+        'next': next_url,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def post_search(request):
+    context = get_search_context(request)
+    thumbnails.prefetch(context['page_obj'])
+    return render(request, 'posts/search.html', context)
+
+
+def post_search_api(request):
+    context = get_search_context(request)
+    page_obj = context['page_obj']
+    results = [
+        {
+            'id': post.pk,
+            'text': post.text,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'pub_date': post.pub_date,
+            'url': reverse('posts:post_detail', args=(post.pk,)),
+        }
+        for post in page_obj
+    ]
+    return JsonResponse({
+        'query': context['query'],
+        'count': page_obj.paginator.count,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'results': results,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@staff_member_required
+def export_posts(request):
+    """Потоковая выгрузка для персонала: ?type=, format=, since=, gzip=1."""
+    kinds = request.GET.getlist('type') or list(exporter.DEFAULT_TYPES)
+    fmt = request.GET.get('format', 'jsonl')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        if fmt not in exporter.FORMATS or not set(kinds) <= set(
+                exporter.EXPORTS):
+            raise ValueError('Неизвестный формат или тип записей')
+        since = request.GET.get('since')
+        since = exporter.parse_since(since) if since else None
+        lines = exporter.lines(kinds, fmt, since)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    filename = 'export.' + fmt + ('.gz' if compress else '')
+    if compress:
+        content_type = 'application/gzip'
+    elif fmt == 'csv':
+        content_type = 'text/csv'
+    else:
+        content_type = 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        exporter.encoded(lines, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -86,7 +241,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
 
@@ -107,6 +262,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -120,18 +276,13 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.FOR_PAGINATOR)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'paginator': paginator,
-        'page_obj': page_obj,
-    }
+    post_list = timeline.feed_for(request.user).for_feed()
+    context = get_page_context(post_list, request)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -140,6 +291,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     get_object_or_404(Follow, user=request.user,
                       author__username=username).delete()
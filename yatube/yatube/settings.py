@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -141,16 +145,160 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
 FOR_PAGINATOR = 10
+# Курсорная паджинация по (pub_date, id) вместо COUNT(*) + OFFSET.
+CURSOR_PAGINATOR = False
+# Сколько номеров страниц показывать по обе стороны от текущей.
+PAGINATOR_WINDOW = 2
+# Комментарии на странице поста и в каждой догружаемой порции.
+COMMENTS_PER_PAGE = 20
+# С какого размера таблицы списки в админке показывают оценку числа строк
+# вместо COUNT(*) (posts.paginators.EstimatedCountPaginator).
+ESTIMATED_COUNT_THRESHOLD = 10000
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры картинок постов, которые строятся сразу после загрузки
+# (posts.thumbnails); шаблоны выводят только размеры из этого списка.
+POST_THUMBNAILS = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+
+# Замеры запросов (core.timing): какая доля запросов получает заголовок
+# Server-Timing и строку лога с полями. 0 выключает middleware целиком.
+SERVER_TIMING_SAMPLE_RATE = 1.0
+
+# Метрики Prometheus (core.metrics) на /metrics. Под gunicorn с несколькими
+# процессами METRICS_DIR указывает на общий каталог (например, в /dev/shm),
+# который очищается перед запуском; без него видны метрики одного процесса.
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+# Без токена /metrics открыт только сотрудникам и при DEBUG.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Профилирование отдельных запросов по подписанному токену сотрудника
+# (core.profiling, manage.py profile_token). Профили видны в админке.
+PROFILER_ENABLED = True
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILER_TOKEN_MAX_AGE = 60 * 60
+PROFILER_REPORT_LINES = 60
+
+# Журнал медленных SQL-запросов (core.slow_queries): запросы дольше порога
+# с местом вызова и EXPLAIN пишутся в ротируемый файл и в админку.
+# None выключает замер.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_KEEP_DAYS = 14
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Фоновые задачи (core.background) выполняются в пуле потоков после
+# коммита. Синхронный режим (False) — только для тестов: в нём PIL и
+# раскладка лент работали бы внутри запроса.
+BACKGROUND_TASKS_ASYNC = True
+BACKGROUND_WORKERS = 4
+
+# Материализованная лента подписок (posts.timeline).
+TIMELINE_SIZE = 1000
+TIMELINE_BATCH_SIZE = 500
+TIMELINE_MAX_FOLLOWING = 2000
+
+# Порция строк для пересчёта счётчиков (manage.py rebuild_counters).
+COUNTERS_CHUNK_SIZE = 1000
+
+# Выгрузка export_posts: сколько строк читать одним запросом.
+EXPORT_CHUNK_SIZE = 2000
+
+# Полнотекстовый поиск (posts.search): сколько лучших совпадений отдавать.
+SEARCH_MAX_RESULTS = 1000
+
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 
+# Двухуровневый кеш (core.tiered_cache): L1 в памяти процесса перед
+# общим для всех воркеров L2. По умолчанию L2 — файловый кеш на хосте;
+# для нескольких хостов задайте CACHE_L2_BACKEND и CACHE_L2_LOCATION
+# (например, memcached). Блокировки и версии кеша опираются на атомарные
+# add и incr: memcached и Redis дают их сами, у файлового L2 их
+# обеспечивает TieredCache через flock, поэтому LOCATION файлового L2
+# должен быть на локальном диске.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.tiered_cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            # Ключи версий областей (posts.cache) всегда читаются из L2:
+            # через них до L1 доходит инвалидация из других процессов.
+            'L1_BYPASS': ('version:',),
+            'GENERATION_INTERVAL': 1.0,
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'CACHE_L2_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get(
+            'CACHE_L2_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
 }
+
+# Тесты получают свой L2 во временном каталоге (core.test_runner).
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Главная сбрасывается сменой версии (posts.cache), а не по истечении TTL.
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+# Оболочки страниц групп, профилей и постов (posts.cache, core.donut):
+# тоже сбрасываются сменой версий.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+# Пока один запрос перестраивает страницу (posts.cache.single_flight),
+# остальные получают устаревшую копию: столько секунд после истечения.
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+# Блокировка перестройки и сколько ждать её без устаревшей копии.
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 5
+
+# Кеш результатов запросов ORM (core.query_cache): включается вызовом
+# .cached() у QuerySet и сбрасывается любой записью в прочитанные таблицы.
+# Точечные запросы к одной таблице на локальной базе не быстрее обращения
+# к кешу: .cached() стоит только там, где замер показал выигрыш (первые
+# страницы лент, поиск автора по имени).
+# Таблицы, которые меняются на каждый запрос, в версиях не участвуют;
+# при кеше в базе (DatabaseCache) добавьте сюда и его таблицу.
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_TIMEOUT = 60 * 5
+QUERY_CACHE_IGNORED_TABLES = (
+    'django_session',
+    'django_admin_log',
+    'core_slowquery',
+    'core_requestprofile',
+)